@@ -0,0 +1,351 @@
+# --- api_server: HTTP API สำหรับประเมินภาพกล้วย (สำหรับเครื่องคัดแยก / แอปมือถือ) ทำงานคู่กับหน้าเว็บ Streamlit ---
+# ตัวอย่างการใช้งาน:
+#   python api_server.py --port 8000 --workers 4
+#   curl -X POST --data-binary @กล้วย.jpg -H 'Content-Type: image/jpeg' 'http://localhost:8000/score?age=25&weight=60&height=170&gender=female'
+#   curl -F image=@ลูกที่1.jpg -F image=@ลูกที่2.jpg http://localhost:8000/score
+#
+# ขั้นตอน: ถอดรหัสภาพ + get_avg_color_rgb ทำใน process pool (จำกัดจำนวน) -> ค่าสีจากหลายคำขอที่มาพร้อมกัน
+# ถูกรวมเป็นกลุ่มเดียวแล้วเรียก model.predict ครั้งเดียว (micro-batching) -> predict_ripeness -> calculate_daily_sugar_allowance
+# ถ้ามีภาพรอประมวลผลเกิน --max-pending จะตอบกลับ 429 ทันทีโดยไม่อ่าน body (backpressure)
+# คำขอที่ใหญ่เกิน --max-body-mb ตอบกลับ 413
+import argparse
+import asyncio
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from batch_score import init_worker
+from brix_engine import (
+    DEFAULT_MAX_WORKING_SIDE,
+    ReloadingModel,
+    calculate_daily_sugar_allowance,
+    decode_image,
+    get_avg_color_rgb,
+    predict_brix,
+    predict_ripeness,
+)
+import pipeline_metrics
+from pipeline_metrics import METRICS
+
+# ค่าเพศที่รับได้ -> ค่าที่ calculate_daily_sugar_allowance ใช้
+GENDERS = {'ชาย': "ชาย", 'male': "ชาย", 'm': "ชาย", 'หญิง': "หญิง", 'female': "หญิง", 'f': "หญิง"}
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def _init_worker(metrics_enabled=False):
+    init_worker()
+    pipeline_metrics.enable(metrics_enabled)
+
+
+def extract_rgb(image_bytes, max_working_side=DEFAULT_MAX_WORKING_SIDE):
+    # ทำงานใน worker process: คืนค่า ((R, G, B) หรือ None, ข้อความ error หรือ None)
+    try:
+        image_np = decode_image(image_bytes)
+    except Exception as e:  # ไฟล์เสีย / ไม่ใช่ภาพ
+        return None, str(e)
+    r_avg, g_avg, b_avg = get_avg_color_rgb(image_np, max_working_side=max_working_side, backend='fused')
+    if r_avg is None:
+        return None, None
+    return (r_avg, g_avg, b_avg), None
+
+
+def extract_rgb_instrumented(image_bytes, max_working_side=DEFAULT_MAX_WORKING_SIDE, profile=False):
+    # เหมือน extract_rgb แต่ส่งสถิติเวลาที่เก็บใน worker process กลับมาด้วย (และผล cProfile ถ้าขอ)
+    if profile:
+        (rgb, error), report = pipeline_metrics.profile_call(extract_rgb, image_bytes, max_working_side)
+    else:
+        (rgb, error), report = extract_rgb(image_bytes, max_working_side), None
+    return rgb, error, METRICS.collect(), report
+
+
+class MicroBatcher:
+    # รวมค่าสีจากคำขอที่มาพร้อมกัน แล้วเรียก model.predict ครั้งเดียวต่อกลุ่ม
+    # รอไม่เกิน max_wait วินาทีหลังได้รายการแรก หรือจนครบ max_batch รายการ
+    def __init__(self, model, max_batch=64, max_wait=0.002):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+    async def predict(self, rgb):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((rgb, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                model = self.model
+                if isinstance(model, ReloadingModel):
+                    # ตรวจ/โหลดไฟล์โมเดลใหม่ใน thread แยก (joblib.load อาจใช้เวลานาน ไม่ให้ event loop ค้าง)
+                    # เฉพาะเมื่อถึงเวลาตรวจ (ทุก 2 วินาที) กลุ่มอื่นใช้โมเดลปัจจุบันได้เลยโดยไม่ต้องสลับ thread
+                    model = await loop.run_in_executor(None, model.refresh) if model.needs_check() else model.model
+                brix_values = predict_brix(model, [rgb for rgb, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), brix in zip(batch, brix_values):
+                if not future.done():  # ผู้เรียกอาจยกเลิกไปแล้ว (client ตัดการเชื่อมต่อ)
+                    future.set_result(float(brix))
+
+
+def parse_personal_data(params):
+    # ข้อมูลส่วนตัว (ไม่บังคับ): age, weight, height, gender, is_patient, needs_weight_loss
+    # ต้องมีครบ 4 ค่าแรกจึงจะคำนวณปริมาณน้ำตาลที่แนะนำต่อวัน คืนค่า None ถ้าไม่ได้ส่งมา
+    required = ('age', 'weight', 'height', 'gender')
+    if not any(key in params for key in required):
+        return None
+    missing = [key for key in required if key not in params]
+    if missing:
+        raise ValueError(f"ข้อมูลส่วนตัวไม่ครบ: {', '.join(missing)}")
+    gender = GENDERS.get(str(params['gender']).strip().lower())
+    if gender is None:
+        raise ValueError("gender ต้องเป็น male/female (ชาย/หญิง)")
+    try:
+        return {
+            'age': int(params['age']),
+            'weight': float(params['weight']),
+            'height': float(params['height']),
+            'gender': gender,
+            'is_patient': str(params.get('is_patient', '')).lower() in TRUE_VALUES,
+            'needs_weight_loss': str(params.get('needs_weight_loss', '')).lower() in TRUE_VALUES,
+        }
+    except ValueError:
+        raise ValueError("age, weight และ height ต้องเป็นตัวเลข")
+
+
+def build_result(name, rgb, error, brix, personal):
+    result = {'name': name, 'found': rgb is not None}
+    if error is not None:
+        result['error'] = error
+    if rgb is None:
+        return result
+    ripeness_level_num, ripeness_status, advice, percentage_ripeness = predict_ripeness(brix)
+    result.update(R=rgb[0], G=rgb[1], B=rgb[2], brix=brix, ripeness_level=ripeness_level_num,
+                  status=ripeness_status, advice=advice, percentage=percentage_ripeness)
+    if personal is not None:
+        daily_sugar_grams_allowance = calculate_daily_sugar_allowance(**personal)
+        result['daily_sugar_allowance_g'] = daily_sugar_grams_allowance
+        # ป้องกันหารด้วยศูนย์ เช่นเดียวกับหน้าเว็บ
+        if daily_sugar_grams_allowance > 0.1:
+            result['percentage_of_daily_allowance'] = brix / daily_sugar_grams_allowance * 100
+    return result
+
+
+class RequestTooLarge(ValueError):
+    pass
+
+
+class ScoringService:
+    def __init__(self, model, workers=None, max_pending=64, max_batch=64, batch_wait_ms=2.0,
+                 max_working_side=DEFAULT_MAX_WORKING_SIDE, max_body_mb=64):
+        self.model = model
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_body_bytes = int(max_body_mb * 1024 * 1024)
+        self.max_working_side = max_working_side
+        self.batcher = MicroBatcher(model, max_batch=max_batch, max_wait=batch_wait_ms / 1000)
+        self.pool = None
+        self.pending = 0
+        self.rejected = 0
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app):
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(METRICS.enabled,))
+        self.batcher.start()
+        try:
+            yield
+        finally:
+            await self.batcher.stop()
+            self.pool.shutdown(cancel_futures=True)
+
+    def limit_body(self, request):
+        # คืน Request ที่นับขนาด body ระหว่างรับข้อมูล และหยุดด้วย RequestTooLarge ทันทีที่เกิน max_body_bytes
+        # (ครอบคลุมทั้ง body ตรงๆ และ multipart รวมถึงการส่งแบบ chunked ที่ไม่มี Content-Length)
+        receive = request.receive
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_body_bytes:
+                    raise RequestTooLarge()
+            return message
+        return Request(request.scope, limited_receive)
+
+    async def read_images(self, request):
+        # คืนค่า (รายการ (ชื่อ, bytes), พารามิเตอร์อื่นๆ)
+        # รองรับทั้งการส่งภาพเดียวเป็น body ตรงๆ และการส่งหลายภาพแบบ multipart/form-data
+        request = self.limit_body(request)
+        params = dict(request.query_params)
+        content_type = request.headers.get('content-type', '')
+        if content_type.startswith('multipart/form-data'):
+            images = []
+            async with request.form(max_files=self.max_pending) as form:
+                for key, value in form.multi_items():
+                    if isinstance(value, UploadFile):
+                        images.append((value.filename or key, await value.read()))
+                    else:
+                        params.setdefault(key, value)
+            return images, params
+        body = await request.body()
+        return ([('body', body)] if body else []), params
+
+    async def score_one(self, name, image_bytes, personal, profile=False):
+        loop = asyncio.get_running_loop()
+        report = None
+        if METRICS.enabled or profile:
+            rgb, error, collected, report = await loop.run_in_executor(
+                self.pool, extract_rgb_instrumented, image_bytes, self.max_working_side, profile)
+            METRICS.merge(collected)
+        else:
+            rgb, error = await loop.run_in_executor(self.pool, extract_rgb, image_bytes, self.max_working_side)
+        brix = await self.batcher.predict(rgb) if rgb is not None else None
+        result = build_result(name, rgb, error, brix, personal)
+        if report is not None:
+            result['profile'] = report
+        return result
+
+    def reject_busy(self):
+        self.rejected += 1
+        pipeline_metrics.incr('http_rejected')
+        return JSONResponse({'error': "เซิร์ฟเวอร์มีงานค้างมากเกินไป กรุณาลองใหม่"}, status_code=429,
+                            headers={'Retry-After': '1'})
+
+    async def score(self, request):
+        # backpressure: ปฏิเสธทันทีถ้างานค้างเกินกำหนด ก่อนอ่าน body (ไม่ต้องรับภาพเข้าหน่วยความจำก่อนแล้วค่อยทิ้ง)
+        if self.pending >= self.max_pending:
+            return self.reject_busy()
+        try:
+            content_length = int(request.headers.get('content-length', 0))
+        except ValueError:
+            return JSONResponse({'error': "Content-Length ไม่ถูกต้อง"}, status_code=400)
+        if content_length > self.max_body_bytes:
+            return JSONResponse({'error': "คำขอใหญ่เกินกำหนด"}, status_code=413)
+        # จองที่ในคิวหนึ่งภาพระหว่างอ่าน body เพื่อให้คำขอที่เข้ามาพร้อมกันนับรวมคำขอที่กำลังอัปโหลดด้วย
+        self.pending += 1
+        try:
+            images, params = await self.read_images(request)
+        except RequestTooLarge:
+            return JSONResponse({'error': "คำขอใหญ่เกินกำหนด"}, status_code=413)
+        except HTTPException as e:
+            # multipart ที่ผิดรูปแบบ หรือมีไฟล์มากกว่า max_pending (ไม่มีทางรับได้แม้คิวว่าง จึงตอบ 413)
+            status_code = 413 if str(e.detail).startswith("Too many files") else e.status_code
+            return JSONResponse({'error': e.detail}, status_code=status_code)
+        finally:
+            self.pending -= 1
+        if not images:
+            return JSONResponse({'error': "ไม่พบไฟล์ภาพในคำขอ"}, status_code=400)
+        try:
+            personal = parse_personal_data(params)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        # ?profile=1: แนบผล cProfile ของการประมวลผลภาพใน worker ไปกับผลลัพธ์ (ใช้หาสาเหตุคำขอที่ช้า)
+        profile = str(params.get('profile', '')).lower() in TRUE_VALUES
+
+        # ตรวจอีกครั้งด้วยจำนวนภาพจริง (multipart อาจมีหลายภาพ) แทนที่จะปล่อยให้คิวยาวจน latency สูงทุกคำขอ
+        if self.pending + len(images) > self.max_pending:
+            return self.reject_busy()
+        self.pending += len(images)
+        try:
+            results = await asyncio.gather(*(self.score_one(name, data, personal, profile) for name, data in images))
+        finally:
+            self.pending -= len(images)
+        return JSONResponse({'results': results})
+
+    async def health(self, request):
+        return JSONResponse({
+            'status': 'ok',
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'predict_batches': self.batcher.batches,
+            'predicted_items': self.batcher.items,
+            'model_reloads': getattr(self.model, 'reloads', 0),
+        })
+
+    async def metrics(self, request):
+        # สถิติเวลาแต่ละขั้นตอน (เปิดด้วย BRIX_METRICS=1 หรือ --metrics) ในรูปแบบ Prometheus
+        return PlainTextResponse(METRICS.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+    async def metrics_json(self, request):
+        return JSONResponse(METRICS.to_json())
+
+
+def create_app(model=None, **service_kwargs):
+    # ค่าเริ่มต้นโหลดโมเดลใหม่เองเมื่อไฟล์ถูกแทนที่ (หลัง python retrain.py fit) โดยไม่ต้อง restart
+    service = ScoringService(model if model is not None else ReloadingModel(), **service_kwargs)
+    return Starlette(
+        routes=[
+            Route('/score', service.score, methods=['POST']),
+            Route('/healthz', service.health, methods=['GET']),
+            Route('/metrics', service.metrics, methods=['GET']),
+            Route('/metrics.json', service.metrics_json, methods=['GET']),
+        ],
+        lifespan=service.lifespan,
+    )
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="HTTP API สำหรับประเมินค่า Brix และระดับความสุกของกล้วย")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model', default=None, help="พาธไฟล์โมเดล (.pkl หรือ .npy) ค่าเริ่มต้นใช้ตาราง lookup ถ้ามี")
+    parser.add_argument('--workers', type=int, default=None, help="จำนวน process ที่ประมวลผลภาพ (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument('--max-pending', type=int, default=64, help="จำนวนภาพที่รอประมวลผลได้สูงสุด ก่อนตอบ 429")
+    parser.add_argument('--max-batch', type=int, default=64, help="จำนวนภาพสูงสุดต่อการเรียก model.predict หนึ่งครั้ง")
+    parser.add_argument('--batch-wait-ms', type=float, default=2.0, help="เวลารอรวมกลุ่มก่อนเรียก model.predict (ms)")
+    parser.add_argument('--metrics', action='store_true', help="เก็บสถิติเวลาแต่ละขั้นตอน (เหมือน BRIX_METRICS=1)")
+    parser.add_argument('--max-side', type=int, default=DEFAULT_MAX_WORKING_SIDE,
+                        help="ย่อภาพให้ด้านที่ยาวที่สุดไม่เกินค่านี้ก่อนประมวลผล (0 = ใช้ความละเอียดเต็ม)")
+    parser.add_argument('--max-body-mb', type=float, default=64, help="ขนาดคำขอสูงสุด (MiB) เกินนี้ตอบ 413")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        pipeline_metrics.enable()
+    model = ReloadingModel(args.model) if args.model else None
+    app = create_app(model, workers=args.workers, max_pending=args.max_pending, max_batch=args.max_batch,
+                     batch_wait_ms=args.batch_wait_ms, max_working_side=args.max_side,
+                     max_body_mb=args.max_body_mb)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
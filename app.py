@@ -1,319 +1,234 @@
-import streamlit as st
-import cv2
-import numpy as np
-import joblib
-from PIL import Image
-import io
-import os
-
-# --- ฟังก์ชัน get_avg_color_rgb (สำหรับประมวลผลสี) ---
-def get_avg_color_rgb(image_array):
-    img = image_array
-    # image_array ที่รับเข้ามาจาก Streamlit จะเป็น RGB (PIL Image)
-    # แต่ OpenCV (cv2) โดยทั่วไปทำงานกับ BGR ดังนั้นต้องแปลงก่อน
-    img_bgr = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-
-    # ลด Noise ด้วย Gaussian Blur (ลองปรับค่า kernel_size หากจำเป็น)
-    # ช่วยให้การตรวจจับสีและรูปร่างดีขึ้น
-    blurred = cv2.GaussianBlur(img_bgr, (5, 5), 0)
-
-    # Step 1: กำหนดช่วงสีของกล้วยในรูปแบบ BGR (ปรับปรุงช่วงสี)
-    # ค่าเหล่านี้อาจต้องปรับจูนอีกครั้ง หากพบว่าตรวจจับกล้วยบางสีไม่ได้
-    # B = Blue, G = Green, R = Red
-    lower_banana_color_bgr = np.array([0, 70, 60])    # สีค่อนไปทางน้ำเงิน/เขียวน้อยๆ, แดง/ส้มน้อยๆ
-    upper_banana_color_bgr = np.array([140, 255, 255]) # สีค่อนไปทางน้ำเงินปานกลาง, เขียว/แดงสูงสุด (ครอบคลุมเหลือง-ส้ม-เขียว)
-
-    # Step 2: สร้าง Mask เพื่อกรองพิกเซลที่อยู่ในช่วงสีที่กำหนด
-    color_mask = cv2.inRange(blurred, lower_banana_color_bgr, upper_banana_color_bgr)
-
-    # Step 3: ใช้ Morphological Operations (Erosion and Dilation) เพื่อลด Noise และเติมเต็มรู
-    # Kernel คือขนาดของตัวกรองที่ใช้ในการดำเนินการ
-    kernel = np.ones((5, 5), np.uint8) # ขนาด 5x5 pixel
-    eroded = cv2.erode(color_mask, kernel, iterations=2) # กัดกร่อน 2 ครั้ง (ลบจุดเล็กๆ)
-    dilated = cv2.dilate(eroded, kernel, iterations=2) # ขยาย 2 ครั้ง (เติมเต็มช่องว่าง)
-
-    # Step 4: หา Contours (โครงร่างของวัตถุที่เชื่อมต่อกัน) ใน Mask ที่ปรับปรุงแล้ว
-    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    # Step 5: หา Contours ที่มีพื้นที่ใหญ่ที่สุด (สันนิษฐานว่าเป็นกล้วย)
-    max_area = 0
-    largest_contour = None
-    for contour in contours:
-        area = cv2.contourArea(contour)
-        if area > max_area:
-            max_area = area
-            largest_contour = contour
-
-    # Step 6: กำหนดเกณฑ์ขั้นต่ำของพื้นที่พิกเซลที่ยอมรับว่าเป็นกล้วย
-    # **สำคัญมาก: ปรับค่านี้ตามขนาดของกล้วยในภาพถ่ายของคุณครู**
-    # ถ้าภาพกล้วยมีขนาดเล็กในภาพรวม ค่านี้ก็ควรน้อยลง ถ้าภาพใหญ่ชัดเจน ก็อาจเพิ่มค่าได้
-    min_banana_pixel_area = 3000 # ค่าเริ่มต้น ลองปรับเพิ่ม/ลด หากพบว่าตรวจจับผิดพลาด
-
-    # Step 7: ตรวจสอบว่าพบวัตถุที่ใหญ่พอและมีลักษณะเป็นสีของกล้วยหรือไม่
-    if largest_contour is None or max_area < min_banana_pixel_area:
-        # หากไม่พบวัตถุขนาดใหญ่พอ หรือไม่มีวัตถุที่อยู่ในช่วงสีที่กำหนด
-        return None, None, None # คืนค่า None เพื่อแจ้งว่าไม่พบกล้วย/ประมวลผลไม่ได้
-
-    # Step 8: สร้าง Mask ใหม่ที่มีเฉพาะวัตถุที่ใหญ่ที่สุด (กล้วย) เท่านั้น
-    final_mask = np.zeros(img_bgr.shape[:2], dtype="uint8") # สร้าง Mask สีดำเปล่าๆ ขนาดเท่าภาพ
-    cv2.drawContours(final_mask, [largest_contour], -1, 255, -1) # วาดโครงร่างที่ใหญ่ที่สุดให้เป็นสีขาว (255) ลงบน Mask นั้น
-
-    # Step 9: คำนวณค่าเฉลี่ย BGR ของพิกเซล โดยใช้ Mask สุดท้ายนี้ (เฉพาะส่วนที่เป็นกล้วย)
-    # ใช้ 'blurred' image ในการคำนวณค่าเฉลี่ย เพื่อลดผลกระทบจาก noise
-    mean_bgr = cv2.mean(blurred, mask=final_mask)[:3]
-
-    # แปลง BGR เฉลี่ยกลับเป็น RGB เพื่อให้เข้ากับการแสดงผล
-    avg_red = mean_bgr[2]
-    avg_green = mean_bgr[1]
-    avg_blue = mean_bgr[0]
-
-    return avg_red, avg_green, avg_blue
-
-# --- ฟังก์ชันคำนวณปริมาณน้ำตาลที่ควรได้รับต่อวัน ---
-def calculate_daily_sugar_allowance(age, weight, height, gender, is_patient, needs_weight_loss):
-    # Mifflin-St Jeor Equation for BMR (Basal Metabolic Rate)
-    if gender == "ชาย":
-        bmr = (10 * weight) + (6.25 * height) - (5 * age) + 5
-    else: # หญิง
-        bmr = (10 * weight) + (6.25 * height) - (5 * age) - 161
-
-    # Activity factor for TDEE (Total Daily Energy Expenditure) - Simplified
-    # Can expand this with more activity levels if needed
-    activity_factor = 1.2 # Sedentary (little to no exercise)
-    tdee = bmr * activity_factor
-
-    # Convert TDEE to recommended sugar intake (approx.)
-    # WHO recommends free sugars not exceeding 10% of total energy intake, ideally < 5%.
-    # 1 gram of sugar is approx. 4 kilocalories.
-    
-    # Let's use 5% of TDEE as a target for sugar for health-conscious/weight loss.
-    # And 10% as a general maximum.
-    
-    # For weight loss or patients, aim for a lower percentage.
-    if needs_weight_loss or is_patient:
-        target_sugar_calories_percent = 0.05 # 5% of TDEE
-    else:
-        target_sugar_calories_percent = 0.10 # 10% of TDEE
-
-    daily_sugar_calories = tdee * target_sugar_calories_percent
-    daily_sugar_grams = daily_sugar_calories / 4 # 1g sugar = 4 kcal
-
-    return daily_sugar_grams
-
-# --- ฟังก์ชันประเมินระดับความสุกและให้คำแนะนำจากค่า Brix ---
-# ปรับช่วงค่า Brix และคำอธิบายตามความเหมาะสมกับข้อมูลของคุณครู
-def predict_ripeness(brix_value):
-    ripeness_level_num = 0 # กำหนดค่าเริ่มต้น
-    status_desc = ""
-    advice_text = ""
-
-    # คำนวณร้อยละความสุก (Brix 0% = 0, Brix 30% = 100%)
-    # ค่า 30.0 เป็นค่า Brix สูงสุดที่คาดการณ์ว่าเป็นสุกจัดเต็มที่
-    percentage_ripeness = min(100.0, max(0.0, (brix_value / 30.0) * 100.0))
-
-    if brix_value <= 5.0:
-        ripeness_level_num = 1
-        status_desc = "กล้วยน้ำว้าดิบ"
-        advice_text = "⭐️ กล้วยยังดิบอยู่ มีแป้งสูงมาก ควรบ่มต่อในที่แห้ง มีอากาศถ่ายเท หรือบ่มร่วมกับผลไม้ที่ปล่อยก๊าซเอทิลีน (เช่น แอปเปิล) อาจใช้เวลา 5-7 วันเพื่อให้สุกตามต้องการ"
-    elif 5.0 < brix_value <= 8.0:
-        ripeness_level_num = 2
-        status_desc = "กล้วยน้ำว้าดิบ (เริ่มอมเหลือง)"
-        advice_text = "✨ กล้วยยังดิบอยู่แต่เริ่มมีสัญญาณการสุก ควรบ่มต่อประมาณ 3-5 วัน เพื่อให้ได้ความหวานที่เพิ่มขึ้น"
-    elif 8.0 < brix_value <= 12.0:
-        ripeness_level_num = 3
-        status_desc = "กล้วยน้ำว้าที่เริ่มสุก (เหลืองปนเขียว)"
-        advice_text = "😊 กล้วยเริ่มสุกแล้ว เนื้อเริ่มนิ่ม รสชาติไม่หวานจัด สามารถรับประทานได้สำหรับผู้ที่ชอบกล้วยไม่หวานมาก หรือบ่มต่อ 2-3 วันให้สุกนิ่มขึ้น"
-    elif 12.0 < brix_value <= 18.0:
-        ripeness_level_num = 4
-        status_desc = "กล้วยน้ำว้าสุกพอดี (เหลืองทั้งผล)"
-        advice_text = "😋 กล้วยสุกกำลังดี เนื้อนิ่ม หวานอร่อย เหมาะสำหรับการรับประทานสด หรือนำไปประกอบอาหารที่ไม่ต้องการความหวานมาก"
-    elif 18.0 < brix_value <= 22.0:
-        ripeness_level_num = 5
-        status_desc = "กล้วยน้ำว้าสุก (มีจุดน้ำตาลเล็กน้อย)"
-        advice_text = "👌 กล้วยสุกกำลังดีถึงสุกงอมเล็กน้อย เนื้อนิ่ม หวานจัด สามารถรับประทานสด หรือนำไปแปรรูปเป็นกล้วยบวชชี หรือเค้กกล้วยหอมได้เลย"
-    elif 22.0 < brix_value <= 25.0:
-        ripeness_level_num = 6
-        status_desc = "กล้วยน้ำว้าสุกงอม (มีจุดน้ำตาลมาก)"
-        advice_text = "😉 กล้วยสุกงอม มีความหวานมาก เนื้อนิ่มมาก อาจมีจุดดำบนเปลือก สามารถนำไปแปรรูปทันที เช่น ทำกล้วยเชื่อม กล้วยฉาบ กล้วยตาก หรือทำขนมหวานได้"
-    else: # brix_value > 25.0
-        ripeness_level_num = 7
-        status_desc = "กล้วยน้ำว้าที่สุกจัดมาก (น้ำตาลเกือบทั้งผล)"
-        advice_text = "👍 กล้วยสุกจัดมาก เนื้อนิ่มเละ หวานจัด เหมาะสำหรับนำไปแปรรูปทันที เช่น ทำกล้วยบวดชี เค้กกล้วยหอม สมูทตี้ หรือแยม"
-    
-    return ripeness_level_num, status_desc, advice_text, percentage_ripeness
-
-# --- โค้ด Streamlit App หลัก ---
-# กำหนดพาธไปยังโมเดลใน GitHub Repository
-model_path = 'banana_brix_model.pkl' 
-
-# โหลดโมเดลที่ฝึกไว้
-try:
-    model = joblib.load(model_path)
-except FileNotFoundError:
-    st.error(f"Error: ไม่พบไฟล์โมเดล '{model_path}' กรุณาตรวจสอบว่าไฟล์อยู่ใน GitHub Repository และพาธถูกต้อง")
-    st.stop() 
-
-# --- การปรับแต่ง CSS ทั่วไป (สำหรับความสวยงาม) ---
-st.markdown("""
-<style>
-    .reportview-container {
-        background: #F0F2F6; /* สีพื้นหลังตาม theme.backgroundColor */
-    }
-    .main .block-container {
-        padding-top: 2rem; /* ลด padding ด้านบน */
-        padding-bottom: 2rem; /* ลด padding ด้านล่าง */
-        padding-left: 1rem;
-        padding-right: 1rem;
-    }
-    .stButton>button {
-        background-color: #FF4B4B; /* สีปุ่มตาม theme.primaryColor */
-        color: white;
-        border-radius: 5px;
-        border: 0px;
-        padding: 0.5rem 1rem;
-        font-size: 1rem;
-        transition: all 0.2s ease-in-out;
-    }
-    .stButton>button:hover {
-        background-color: #FF6363; /* สีปุ่มเมื่อเมาส์ชี้ */
-        color: white;
-    }
-    h1 {
-        text-align: center;
-        color: #26272E; /* สีตัวอักษรตาม theme.textColor */
-        margin-bottom: 0.5rem;
-    }
-    h2 {
-        color: #FF4B4B; /* สีหัวข้อตาม primaryColor */
-        text-align: center;
-        margin-bottom: 0.5rem;
-    }
-    h3 {
-        color: #26272E; /* สีหัวข้อรองตาม textColor */
-        margin-top: 1.5rem;
-        margin-bottom: 0.5rem;
-    }
-    .stMetric {
-        background-color: #FFFFFF; /* สีพื้นหลัง metric */
-        border-radius: 10px;
-        padding: 1rem;
-        margin-bottom: 1rem;
-        box-shadow: 2px 2px 10px rgba(0,0,0,0.05); /* เพิ่มเงา */
-    }
-    .stAlert {
-        border-radius: 10px;
-    }
-    .stFileUploader, .stCameraInput {
-        border: 1px dashed #FF4B4B; /* เส้นขอบสำหรับอัปโหลด */
-        border-radius: 10px;
-        padding: 1rem;
-        text-align: center;
-        background-color: #FFFFFF;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-
-# --- ส่วนหัวข้อแอป ---
-col_logo, col_title = st.columns([1, 4])
-with col_logo:
-    st.image("https://images.emojiterra.com/google/noto-emoji/unicode-15/color/512px/1f34c.png", width=70) # รูปกล้วยอีโมจิ
-with col_title:
-    st.title("แอปประเมินระดับความหวานและสถานะกล้วยน้ำว้า")
-st.markdown("---")
-
-
-# --- ส่วนหลักของแอป (จัดวางเรียงลงมา) ---
-st.header("1. ข้อมูลส่วนตัว (สำหรับคำแนะนำสุขภาพ)")
-col_personal_data_1, col_personal_data_2 = st.columns(2)
-with col_personal_data_1:
-    age = st.number_input("อายุ (ปี)", min_value=1, max_value=120, value=25)
-    weight = st.number_input("น้ำหนัก (กิโลกรัม)", min_value=1.0, max_value=200.0, value=60.0, step=0.1)
-with col_personal_data_2:
-    height = st.number_input("ส่วนสูง (เซนติเมตร)", min_value=10.0, max_value=250.0, value=170.0, step=0.1)
-    gender = st.selectbox("เพศ", ["ชาย", "หญิง"])
-
-is_patient = st.checkbox("เป็นผู้ป่วย (เช่น เบาหวาน)", help="ข้อมูลนี้ใช้เพื่อปรับคำแนะนำปริมาณน้ำตาลให้เหมาะสมยิ่งขึ้น")
-needs_weight_loss = st.checkbox("ต้องการลดน้ำหนัก / รักษาสุขภาพ", help="ข้อมูลนี้ใช้เพื่อปรับคำแนะนำปริมาณน้ำตาลให้เหมาะสมยิ่งขึ้น")
-
-st.markdown("---")
-
-st.header("2. ถ่ายภาพหรืออัปโหลดรูปกล้วยน้ำว้า")
-uploaded_file = st.file_uploader("เลือกรูปภาพกล้วยน้ำว้า", type=["jpg", "jpeg", "png"])
-camera_input = st.camera_input("หรือ ถ่ายรูปกล้วยน้ำว้าจากกล้อง")
-
-image_source = None
-if uploaded_file is not None:
-    image_source = uploaded_file
-elif camera_input is not None:
-    image_source = camera_input
-
-if image_source is not None:
-    image_bytes = image_source.read()
-    image_pil = Image.open(io.BytesIO(image_bytes))
-    image_np = np.array(image_pil)
-    
-    st.image(image_pil, caption='รูปภาพกล้วยน้ำว้าของคุณ', use_container_width=True)
-
-    st.header("3. ผลการประเมินและคำแนะนำสุขภาพ") # ปรับเป็นหัวข้อที่ 3
-    if st.button('ประเมินสถานะกล้วยและรับคำแนะนำ', use_container_width=True): # ปรับข้อความปุ่ม
-        with st.spinner('กำลังวิเคราะห์...'):
-            ripeness_result = get_avg_color_rgb(image_np) 
-
-            if ripeness_result[0] is None:
-                st.warning("ไม่พบกล้วยในภาพ หรือภาพไม่ชัดเจน กรุณาลองถ่ายภาพใหม่ให้เห็นกล้วยชัดเจน")
-            else:
-                r_avg, g_avg, b_avg = ripeness_result
-
-                input_features = np.array([[r_avg, g_avg, b_avg]])
-                predicted_brix = model.predict(input_features)[0]
-                # ***สำคัญ: ป้องกันค่า Brix ไม่ให้ติดลบ***
-                predicted_brix = max(0.0, predicted_brix) 
-
-                ripeness_level_num, ripeness_status, advice, percentage_ripeness = predict_ripeness(predicted_brix)
-
-                # --- ส่วนแสดงผลลัพธ์จากกล้วย ---
-                st.success("ผลการประเมินกล้วยเสร็จสิ้น!")
-                st.metric(label="ระดับความหวาน (Brix)", value=f"{predicted_brix:.2f} °Bx")
-                st.metric(label="ปริมาณน้ำตาล (กรัม/100กรัม)", value=f"{predicted_brix:.2f} g") # Brix ประมาณเท่ากับกรัมน้ำตาล/100กรัม
-                st.metric(label="ร้อยละความสุก", value=f"{percentage_ripeness:.1f}%") # แสดงผลร้อยละความสุก
-                st.subheader(f"สถานะกล้วยน้ำว้า: {ripeness_status}")
-                st.subheader(f"ระดับความสุก: {ripeness_level_num} (จาก 7 ระดับ)")
-                st.info(advice) # แสดงคำแนะนำ
-                st.caption(f"ค่าสีเฉลี่ย (RGB) ที่ได้: R={r_avg:.0f}, G={g_avg:.0f}, B={b_avg:.0f}")
-
-                st.markdown("---")
-                
-                # --- ส่วนคำแนะนำสุขภาพส่วนบุคคล ---
-                st.subheader("คำแนะนำปริมาณน้ำตาลสำหรับคุณ")
-                daily_sugar_grams_allowance = calculate_daily_sugar_allowance(age, weight, height, gender, is_patient, needs_weight_loss)
-                
-                # ป้องกันหารด้วยศูนย์ ถ้า daily_sugar_grams_allowance เป็น 0 หรือใกล้ 0
-                if daily_sugar_grams_allowance > 0.1: # กำหนดค่าต่ำสุดที่ยอมรับได้
-                    percentage_of_daily_allowance = (predicted_brix / daily_sugar_grams_allowance) * 100
-                    st.metric(label="ปริมาณน้ำตาลที่แนะนำต่อวัน", value=f"{daily_sugar_grams_allowance:.1f} g")
-                    
-                    st.markdown("**สัดส่วนปริมาณน้ำตาลจากกล้วยต่อปริมาณที่แนะนำต่อวัน:**")
-                    progress_value = min(1.0, percentage_of_daily_allowance / 100.0) # Cap at 1.0 (100%)
-                    st.progress(progress_value)
-                    st.write(f"กล้วยน้ำว้า 100 กรัมนี้ (ประมาณ 1 ผลเล็กถึงกลาง) มีปริมาณน้ำตาลประมาณ **{predicted_brix:.1f} กรัม** ซึ่งคิดเป็น **{percentage_of_daily_allowance:.1f}%** ของปริมาณที่แนะนำต่อวันของคุณ")
-                    
-                    if percentage_of_daily_allowance > 100:
-                        st.warning("⚠️ กล้วยลูกนี้ให้ปริมาณน้ำตาลเกินกว่าปริมาณที่แนะนำต่อวันของคุณ")
-                    elif percentage_of_daily_allowance > 50:
-                        st.warning("⚠️ กล้วยลูกนี้ให้ปริมาณน้ำตาลเกินครึ่งหนึ่งของปริมาณที่แนะนำต่อวันของคุณ")
-                    elif percentage_of_daily_allowance > 25:
-                        st.info("💡 กล้วยลูกนี้ให้ปริมาณน้ำตาลในระดับปานกลางเทียบกับปริมาณที่แนะนำต่อวันของคุณ")
-                    else:
-                        st.success("✅ กล้วยลูกนี้ให้ปริมาณน้ำตาลในระดับต่ำเทียบกับปริมาณที่แนะนำต่อวันของคุณ")
-
-                else:
-                    st.write("ไม่สามารถคำนวณสัดส่วนปริมาณน้ำตาลที่แนะนำต่อวันได้ เนื่องจากข้อมูลส่วนบุคคลไม่สมบูรณ์ หรือคำนวณปริมาณที่แนะนำได้น้อยมาก")
-
-                st.warning("**ข้อจำกัด:** ข้อมูลนี้เป็นการประมาณการเบื้องต้น ไม่ใช่คำแนะนำทางการแพทย์ ควรปรึกษาแพทย์หรือนักโภชนาการสำหรับคำแนะนำเฉพาะบุคคล.")
-
-else: # ข้อความแนะนำเมื่อยังไม่มีภาพ
-    st.info("กรุณาป้อนข้อมูลส่วนตัวด้านบน, อัปโหลดรูปกล้วย หรือถ่ายภาพกล้วยเพื่อเริ่มการประเมินและรับคำแนะนำสุขภาพ")
-
-st.markdown("---")
-st.markdown("พัฒนาโดย นางสาวนรินทร์ธร พิมสา, นางสาวนิชาภา ศรีละวัลย์ และนางสาวรัตนาวดี สว่างศรี<br>อาจารย์ที่ปรึกษา: นายอชิตพล บุณรัตน์, นางสาวปทุมวดี วงษ์สุธรรม และนางสาวสมใจ จันทรงกรด<br>โรงเรียนวังโพรงพิทยาคม สำนักงานเขตพื้นที่การศึกษามัธยมศึกษาพิษณุโลก อุตรดิตถ์", unsafe_allow_html=True)
+import streamlit as st
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline_metrics
+
+# หมายเหตุ: brix_engine (OpenCV, numpy, PIL) ไม่ได้ import ไว้ที่ส่วนบนของไฟล์
+# เพื่อให้หน้าเว็บแสดงผลได้ทันทีตอนเริ่ม container และโหลดส่วนที่หนักใน background thread แทน
+
+# --- โค้ด Streamlit App หลัก ---
+# รูปโลโก้กล้วย (เก็บไว้ใน repository ไม่ต้องดาวน์โหลดจากอินเทอร์เน็ตทุกครั้งที่แสดงผล)
+logo_path = 'banana_logo.png'
+
+# จำนวนภาพล่าสุดที่เก็บผลการวิเคราะห์ไว้ในหน่วยความจำ (LRU, ใช้ร่วมกันทุก session)
+IMAGE_CACHE_MAX_ENTRIES = 32
+
+# --- โหลดโมเดลล่วงหน้าใน background (warm-up) ---
+def load_engine_and_model():
+    # import โมดูลประมวลผลภาพ และโหลดโมเดล
+    # ใช้ตาราง lookup (banana_brix_lut.online.npy ของโมเดลที่ฝึกต่อ หรือ banana_brix_lut.npy) ถ้ามี
+    # เพื่อไม่ต้องโหลด scikit-learn; ไม่เช่นนั้นใช้ไฟล์ .pkl
+    # ReloadingModel โหลดไฟล์ใหม่เองเมื่อถูกแทนที่ (หลัง python retrain.py fit) โดยไม่ต้อง restart แอป
+    import brix_engine
+    return brix_engine.ReloadingModel()
+
+@st.cache_resource(show_spinner=False)
+def start_model_warm_up():
+    # เริ่มทำงานเพียงครั้งเดียวต่อ process (ครั้งแรกที่มีผู้ใช้เปิดหน้าเว็บ) ระหว่างที่ผู้ใช้กรอกข้อมูล
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='brix-warm-up')
+    return executor.submit(load_engine_and_model)
+
+def get_model():
+    # รอจนโหลดเสร็จ (ถ้ายังไม่เสร็จ) แล้วคืนโมเดลตัวเดียวกันให้ทุก session
+    return start_model_warm_up().result()
+
+# --- ฟังก์ชันที่ถูก cache ไว้ข้ามการ rerun ของ Streamlit ---
+# ทุกครั้งที่ผู้ใช้เปลี่ยนค่าใน widget (เช่น อายุ) Streamlit จะรันสคริปต์ใหม่ทั้งไฟล์
+# จึงโหลดโมเดลเพียงครั้งเดียวต่อ process และ cache ผลของภาพโดยใช้ hash ของเนื้อไฟล์เป็น key
+@st.cache_data(max_entries=IMAGE_CACHE_MAX_ENTRIES, show_spinner=False)
+def get_avg_color_rgb_cached(image_bytes):
+    # cache เฉพาะผลลัพธ์ (ค่าสีเฉลี่ย 3 ค่า) ไม่เก็บภาพที่ถอดรหัสแล้ว
+    # (ภาพ 12MP ใช้หน่วยความจำราว 36 MB ต่อภาพ และ key เดียวกันกับ cache นี้ จึงแทบไม่มีครั้งที่ใช้ซ้ำได้)
+    # ย่อภาพความละเอียดสูงจากกล้องมือถือก่อนหาตำแหน่งกล้วย เพื่อลดเวลาและหน่วยความจำ
+    pipeline_metrics.incr('analysis_cache_misses')
+    from brix_engine import DEFAULT_MAX_WORKING_SIDE, decode_image, get_avg_color_rgb
+    return get_avg_color_rgb(decode_image(image_bytes), max_working_side=DEFAULT_MAX_WORKING_SIDE,
+                             backend='fused')
+
+start_model_warm_up()
+
+# --- การปรับแต่ง CSS ทั่วไป (สำหรับความสวยงาม) ---
+st.markdown("""
+<style>
+    .reportview-container {
+        background: #F0F2F6; /* สีพื้นหลังตาม theme.backgroundColor */
+    }
+    .main .block-container {
+        padding-top: 2rem; /* ลด padding ด้านบน */
+        padding-bottom: 2rem; /* ลด padding ด้านล่าง */
+        padding-left: 1rem;
+        padding-right: 1rem;
+    }
+    .stButton>button {
+        background-color: #FF4B4B; /* สีปุ่มตาม theme.primaryColor */
+        color: white;
+        border-radius: 5px;
+        border: 0px;
+        padding: 0.5rem 1rem;
+        font-size: 1rem;
+        transition: all 0.2s ease-in-out;
+    }
+    .stButton>button:hover {
+        background-color: #FF6363; /* สีปุ่มเมื่อเมาส์ชี้ */
+        color: white;
+    }
+    h1 {
+        text-align: center;
+        color: #26272E; /* สีตัวอักษรตาม theme.textColor */
+        margin-bottom: 0.5rem;
+    }
+    h2 {
+        color: #FF4B4B; /* สีหัวข้อตาม primaryColor */
+        text-align: center;
+        margin-bottom: 0.5rem;
+    }
+    h3 {
+        color: #26272E; /* สีหัวข้อรองตาม textColor */
+        margin-top: 1.5rem;
+        margin-bottom: 0.5rem;
+    }
+    .stMetric {
+        background-color: #FFFFFF; /* สีพื้นหลัง metric */
+        border-radius: 10px;
+        padding: 1rem;
+        margin-bottom: 1rem;
+        box-shadow: 2px 2px 10px rgba(0,0,0,0.05); /* เพิ่มเงา */
+    }
+    .stAlert {
+        border-radius: 10px;
+    }
+    .stFileUploader, .stCameraInput {
+        border: 1px dashed #FF4B4B; /* เส้นขอบสำหรับอัปโหลด */
+        border-radius: 10px;
+        padding: 1rem;
+        text-align: center;
+        background-color: #FFFFFF;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+
+# --- ส่วนหัวข้อแอป ---
+col_logo, col_title = st.columns([1, 4])
+with col_logo:
+    st.image(logo_path, width=70) # รูปโลโก้กล้วย
+with col_title:
+    st.title("แอปประเมินระดับความหวานและสถานะกล้วยน้ำว้า")
+st.markdown("---")
+
+
+# --- ส่วนหลักของแอป (จัดวางเรียงลงมา) ---
+st.header("1. ข้อมูลส่วนตัว (สำหรับคำแนะนำสุขภาพ)")
+col_personal_data_1, col_personal_data_2 = st.columns(2)
+with col_personal_data_1:
+    age = st.number_input("อายุ (ปี)", min_value=1, max_value=120, value=25)
+    weight = st.number_input("น้ำหนัก (กิโลกรัม)", min_value=1.0, max_value=200.0, value=60.0, step=0.1)
+with col_personal_data_2:
+    height = st.number_input("ส่วนสูง (เซนติเมตร)", min_value=10.0, max_value=250.0, value=170.0, step=0.1)
+    gender = st.selectbox("เพศ", ["ชาย", "หญิง"])
+
+is_patient = st.checkbox("เป็นผู้ป่วย (เช่น เบาหวาน)", help="ข้อมูลนี้ใช้เพื่อปรับคำแนะนำปริมาณน้ำตาลให้เหมาะสมยิ่งขึ้น")
+needs_weight_loss = st.checkbox("ต้องการลดน้ำหนัก / รักษาสุขภาพ", help="ข้อมูลนี้ใช้เพื่อปรับคำแนะนำปริมาณน้ำตาลให้เหมาะสมยิ่งขึ้น")
+
+st.markdown("---")
+
+st.header("2. ถ่ายภาพหรืออัปโหลดรูปกล้วยน้ำว้า")
+uploaded_file = st.file_uploader("เลือกรูปภาพกล้วยน้ำว้า", type=["jpg", "jpeg", "png"])
+camera_input = st.camera_input("หรือ ถ่ายรูปกล้วยน้ำว้าจากกล้อง")
+
+image_source = None
+if uploaded_file is not None:
+    image_source = uploaded_file
+elif camera_input is not None:
+    image_source = camera_input
+
+if image_source is not None:
+    image_bytes = image_source.getvalue()
+    image_digest = hashlib.sha256(image_bytes).hexdigest()
+
+    # แสดงภาพจาก bytes โดยตรง ไม่ต้องถอดรหัสด้วย PIL ทุกครั้งที่ rerun
+    st.image(image_bytes, caption='รูปภาพกล้วยน้ำว้าของคุณ', use_container_width=True)
+
+    st.header("3. ผลการประเมินและคำแนะนำสุขภาพ") # ปรับเป็นหัวข้อที่ 3
+    if st.button('ประเมินสถานะกล้วยและรับคำแนะนำ', use_container_width=True): # ปรับข้อความปุ่ม
+        st.session_state['analyzed_image_digest'] = image_digest
+
+    # เมื่อประเมินภาพนี้ไปแล้ว ให้แสดงผลต่อไปแม้ผู้ใช้จะแก้ไขข้อมูลส่วนตัว
+    # (ผลการวิเคราะห์ภาพมาจาก cache จึงคำนวณใหม่เฉพาะปริมาณน้ำตาลที่แนะนำต่อวัน)
+    if st.session_state.get('analyzed_image_digest') == image_digest:
+        with st.spinner('กำลังวิเคราะห์...'):
+            # โหลดโมเดลที่ฝึกไว้ (ปกติจะโหลดเสร็จใน background แล้ว)
+            try:
+                model = get_model()
+            except FileNotFoundError as e:
+                st.error(f"Error: ไม่พบไฟล์โมเดล '{e.filename}' กรุณาตรวจสอบว่าไฟล์อยู่ใน GitHub Repository และพาธถูกต้อง")
+                # ล้าง cache_resource (ซึ่งเก็บ Future ที่ล้มเหลวไว้) เพื่อให้ครั้งถัดไปโหลดใหม่เมื่อนำไฟล์กลับมาแล้ว
+                start_model_warm_up.clear()
+                st.stop()
+            from brix_engine import calculate_daily_sugar_allowance, score_rgb
+
+            pipeline_metrics.incr('analysis_requests')
+            ripeness_result = get_avg_color_rgb_cached(image_bytes)
+
+            if ripeness_result[0] is None:
+                st.warning("ไม่พบกล้วยในภาพ หรือภาพไม่ชัดเจน กรุณาลองถ่ายภาพใหม่ให้เห็นกล้วยชัดเจน")
+            else:
+                r_avg, g_avg, b_avg = ripeness_result
+
+                # ทำนาย Brix (ป้องกันค่าติดลบแล้วภายใน score_rgb) และประเมินระดับความสุก
+                predicted_brix, ripeness_level_num, ripeness_status, advice, percentage_ripeness = score_rgb(model, r_avg, g_avg, b_avg)
+
+                # --- ส่วนแสดงผลลัพธ์จากกล้วย ---
+                st.success("ผลการประเมินกล้วยเสร็จสิ้น!")
+                st.metric(label="ระดับความหวาน (Brix)", value=f"{predicted_brix:.2f} °Bx")
+                st.metric(label="ปริมาณน้ำตาล (กรัม/100กรัม)", value=f"{predicted_brix:.2f} g") # Brix ประมาณเท่ากับกรัมน้ำตาล/100กรัม
+                st.metric(label="ร้อยละความสุก", value=f"{percentage_ripeness:.1f}%") # แสดงผลร้อยละความสุก
+                st.subheader(f"สถานะกล้วยน้ำว้า: {ripeness_status}")
+                st.subheader(f"ระดับความสุก: {ripeness_level_num} (จาก 7 ระดับ)")
+                st.info(advice) # แสดงคำแนะนำ
+                st.caption(f"ค่าสีเฉลี่ย (RGB) ที่ได้: R={r_avg:.0f}, G={g_avg:.0f}, B={b_avg:.0f}")
+
+                st.markdown("---")
+                
+                # --- ส่วนคำแนะนำสุขภาพส่วนบุคคล ---
+                st.subheader("คำแนะนำปริมาณน้ำตาลสำหรับคุณ")
+                daily_sugar_grams_allowance = calculate_daily_sugar_allowance(age, weight, height, gender, is_patient, needs_weight_loss)
+                
+                # ป้องกันหารด้วยศูนย์ ถ้า daily_sugar_grams_allowance เป็น 0 หรือใกล้ 0
+                if daily_sugar_grams_allowance > 0.1: # กำหนดค่าต่ำสุดที่ยอมรับได้
+                    percentage_of_daily_allowance = (predicted_brix / daily_sugar_grams_allowance) * 100
+                    st.metric(label="ปริมาณน้ำตาลที่แนะนำต่อวัน", value=f"{daily_sugar_grams_allowance:.1f} g")
+                    
+                    st.markdown("**สัดส่วนปริมาณน้ำตาลจากกล้วยต่อปริมาณที่แนะนำต่อวัน:**")
+                    progress_value = min(1.0, percentage_of_daily_allowance / 100.0) # Cap at 1.0 (100%)
+                    st.progress(progress_value)
+                    st.write(f"กล้วยน้ำว้า 100 กรัมนี้ (ประมาณ 1 ผลเล็กถึงกลาง) มีปริมาณน้ำตาลประมาณ **{predicted_brix:.1f} กรัม** ซึ่งคิดเป็น **{percentage_of_daily_allowance:.1f}%** ของปริมาณที่แนะนำต่อวันของคุณ")
+                    
+                    if percentage_of_daily_allowance > 100:
+                        st.warning("⚠️ กล้วยลูกนี้ให้ปริมาณน้ำตาลเกินกว่าปริมาณที่แนะนำต่อวันของคุณ")
+                    elif percentage_of_daily_allowance > 50:
+                        st.warning("⚠️ กล้วยลูกนี้ให้ปริมาณน้ำตาลเกินครึ่งหนึ่งของปริมาณที่แนะนำต่อวันของคุณ")
+                    elif percentage_of_daily_allowance > 25:
+                        st.info("💡 กล้วยลูกนี้ให้ปริมาณน้ำตาลในระดับปานกลางเทียบกับปริมาณที่แนะนำต่อวันของคุณ")
+                    else:
+                        st.success("✅ กล้วยลูกนี้ให้ปริมาณน้ำตาลในระดับต่ำเทียบกับปริมาณที่แนะนำต่อวันของคุณ")
+
+                else:
+                    st.write("ไม่สามารถคำนวณสัดส่วนปริมาณน้ำตาลที่แนะนำต่อวันได้ เนื่องจากข้อมูลส่วนบุคคลไม่สมบูรณ์ หรือคำนวณปริมาณที่แนะนำได้น้อยมาก")
+
+                st.warning("**ข้อจำกัด:** ข้อมูลนี้เป็นการประมาณการเบื้องต้น ไม่ใช่คำแนะนำทางการแพทย์ ควรปรึกษาแพทย์หรือนักโภชนาการสำหรับคำแนะนำเฉพาะบุคคล.")
+
+else: # ข้อความแนะนำเมื่อยังไม่มีภาพ
+    st.info("กรุณาป้อนข้อมูลส่วนตัวด้านบน, อัปโหลดรูปกล้วย หรือถ่ายภาพกล้วยเพื่อเริ่มการประเมินและรับคำแนะนำสุขภาพ")
+
+# --- สถิติประสิทธิภาพ (แสดงเฉพาะเมื่อรันด้วย BRIX_METRICS=1) ---
+if pipeline_metrics.METRICS.enabled:
+    with st.expander("สถิติเวลาการประมวลผลภาพ (BRIX_METRICS)"):
+        st.json(pipeline_metrics.METRICS.to_json())
+        st.download_button("ดาวน์โหลดในรูปแบบ Prometheus", pipeline_metrics.METRICS.render_prometheus(),
+                           file_name="brix_metrics.txt", mime="text/plain")
+
+st.markdown("---")
+st.markdown("พัฒนาโดย นางสาวนรินทร์ธร พิมสา, นางสาวนิชาภา ศรีละวัลย์ และนางสาวรัตนาวดี สว่างศรี<br>อาจารย์ที่ปรึกษา: นายอชิตพล บุณรัตน์, นางสาวปทุมวดี วงษ์สุธรรม และนางสาวสมใจ จันทรงกรด<br>โรงเรียนวังโพรงพิทยาคม สำนักงานเขตพื้นที่การศึกษามัธยมศึกษาพิษณุโลก อุตรดิตถ์", unsafe_allow_html=True)
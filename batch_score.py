@@ -0,0 +1,197 @@
+# --- batch_score: ประเมินค่า Brix ของภาพกล้วยจำนวนมากโดยไม่ต้องเปิดหน้าเว็บ Streamlit ---
+# ตัวอย่างการใช้งาน:
+#   python batch_score.py ภาพ/ลังที่1/ --format csv > ผลลัพธ์.csv
+#   python batch_score.py a.jpg b.jpg --workers 8 --format jsonl
+#
+# ขั้นตอน: อ่านภาพ + get_avg_color_rgb ทำแบบขนานใน process pool
+# จากนั้นนำค่าสีเฉลี่ยมาซ้อนเป็นเมทริกซ์ แล้วเรียก model.predict ครั้งเดียวต่อหนึ่งกลุ่ม (batch)
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cv2
+
+from brix_engine import (
+    DEFAULT_MAX_WORKING_SIDE,
+    SEGMENTATION_BACKENDS,
+    detect_bananas,
+    get_avg_color_rgb,
+    load_image,
+    load_model,
+    load_serving_model,
+    predict_brix,
+    predict_ripeness,
+    score_bananas,
+)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+OUTPUT_FIELDS = ['path', 'R', 'G', 'B', 'brix', 'ripeness_level', 'percentage']
+# โหมด --multi: หนึ่งแถวต่อกล้วยหนึ่งลูก (object = ลำดับของกล้วยในภาพ เรียงจากใหญ่ไปเล็ก)
+MULTI_OUTPUT_FIELDS = ['path', 'object', 'x', 'y', 'width', 'height', 'area',
+                       'R', 'G', 'B', 'brix', 'ripeness_level', 'percentage']
+
+
+def iter_image_paths(inputs, recursive=True):
+    # รับได้ทั้งไฟล์ภาพและโฟลเดอร์ (โฟลเดอร์จะถูกไล่หาไฟล์ภาพตามนามสกุล เรียงตามชื่อ)
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+                if not recursive:
+                    break
+        else:
+            yield item
+
+
+def init_worker():
+    # ใช้เป็น initializer ของ process pool (batch_score, retrain, api_server)
+    # ให้แต่ละ process ใช้ OpenCV แบบ thread เดียว เพื่อไม่ให้แย่ง CPU กันเอง (ทำให้ขยายตามจำนวน core ได้เกือบเป็นเส้นตรง)
+    cv2.setNumThreads(1)
+
+
+def extract_features(path, max_working_side=None, backend='fused'):
+    # ทำงานใน worker process: อ่านภาพ -> หาค่าสีเฉลี่ยของกล้วย
+    # คืนค่า (path, (R, G, B) หรือ None, ข้อความ error หรือ None)
+    try:
+        image_np = load_image(path)
+    except Exception as e:  # ไฟล์เสีย / ไม่ใช่ภาพ
+        return path, None, str(e)
+    r_avg, g_avg, b_avg = get_avg_color_rgb(image_np, max_working_side=max_working_side, backend=backend)
+    if r_avg is None:
+        return path, None, None
+    return path, (r_avg, g_avg, b_avg), None
+
+
+def extract_all_bananas(path, max_working_side=None):
+    # เหมือน extract_features แต่คืนค่ารายการกล้วยทุกลูกในภาพ (ผลจาก detect_bananas) แทนค่าสีเดียว
+    try:
+        image_np = load_image(path)
+    except Exception as e:  # ไฟล์เสีย / ไม่ใช่ภาพ
+        return path, None, str(e)
+    return path, detect_bananas(image_np, max_working_side=max_working_side), None
+
+
+def score_batch_multi(model, extracted):
+    # รวมกล้วยทุกลูกจากทุกภาพในกลุ่ม แล้วเรียก model.predict ครั้งเดียว
+    bananas = [banana for _, found, _ in extracted if found for banana in found]
+    score_bananas(model, bananas)
+    rows = []
+    for path, found, _ in extracted:
+        if not found:
+            row = dict.fromkeys(MULTI_OUTPUT_FIELDS)
+            row['path'] = path
+            rows.append(row)
+            continue
+        for index, banana in enumerate(found, start=1):
+            x, y, w, h = banana['bbox']
+            rows.append({
+                'path': path, 'object': index, 'x': x, 'y': y, 'width': w, 'height': h, 'area': banana['area'],
+                'R': banana['R'], 'G': banana['G'], 'B': banana['B'], 'brix': banana['brix'],
+                'ripeness_level': banana['ripeness_level'], 'percentage': banana['percentage'],
+            })
+    return rows
+
+
+def score_batch(model, extracted):
+    # extracted: รายการผลลัพธ์จาก extract_features -> คืนค่าแถวผลลัพธ์ (dict) ตามลำดับเดิม
+    found = [rgb for _, rgb, _ in extracted if rgb is not None]
+    brix_values = iter(predict_brix(model, found))
+    rows = []
+    for path, rgb, _ in extracted:
+        row = dict.fromkeys(OUTPUT_FIELDS)
+        row['path'] = path
+        if rgb is not None:
+            brix = float(next(brix_values))
+            ripeness_level_num, _, _, percentage_ripeness = predict_ripeness(brix)
+            row.update(R=rgb[0], G=rgb[1], B=rgb[2], brix=brix,
+                       ripeness_level=ripeness_level_num, percentage=percentage_ripeness)
+        rows.append(row)
+    return rows
+
+
+def score_paths(paths, model, workers=None, batch_size=256, chunksize=4, max_working_side=DEFAULT_MAX_WORKING_SIDE,
+                backend='fused', multi=False):
+    # generator: ส่งผลลัพธ์ออกทีละกลุ่มตามลำดับของไฟล์ที่ป้อนเข้ามา (streaming)
+    # batch_size <= 0 หมายถึงรวมทุกภาพเป็นกลุ่มเดียว แล้วเรียก model.predict ครั้งเดียว
+    # multi=True: ให้คะแนนกล้วยทุกลูกในภาพ (detect_bananas) แทนเฉพาะลูกที่ใหญ่ที่สุด
+    if multi:
+        extract = partial(extract_all_bananas, max_working_side=max_working_side)
+        score = score_batch_multi
+    else:
+        extract = partial(extract_features, max_working_side=max_working_side, backend=backend)
+        score = score_batch
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        pending = []
+        for result in pool.map(extract, paths, chunksize=chunksize):
+            if result[2] is not None:
+                print(f"ข้ามไฟล์ {result[0]}: {result[2]}", file=sys.stderr)
+            pending.append(result)
+            if batch_size > 0 and len(pending) >= batch_size:
+                yield from score(model, pending)
+                pending = []
+        if pending:
+            yield from score(model, pending)
+
+
+class _CsvWriter:
+    def __init__(self, stream, fieldnames=OUTPUT_FIELDS):
+        self.stream = stream
+        self.writer = csv.DictWriter(stream, fieldnames=fieldnames)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.stream.flush()
+
+
+class _JsonlWriter:
+    def __init__(self, stream, fieldnames=OUTPUT_FIELDS):
+        self.stream = stream
+
+    def write(self, row):
+        self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+
+WRITERS = {'csv': _CsvWriter, 'jsonl': _JsonlWriter}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ประเมินค่า Brix และระดับความสุกของภาพกล้วยจำนวนมาก (batch)")
+    parser.add_argument('inputs', nargs='+', help="ไฟล์ภาพ หรือโฟลเดอร์ที่มีภาพ (.jpg/.jpeg/.png)")
+    parser.add_argument('--model', default=None,
+                        help="พาธไฟล์โมเดล (.pkl หรือ .npy) ค่าเริ่มต้น = โมเดลเดียวกับที่แอปและ API ใช้")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='csv', help="รูปแบบผลลัพธ์")
+    parser.add_argument('--output', '-o', default='-', help="ไฟล์ผลลัพธ์ ('-' = stdout)")
+    parser.add_argument('--workers', type=int, default=None, help="จำนวน process (ค่าเริ่มต้น = จำนวน CPU)")
+    parser.add_argument('--batch-size', type=int, default=256, help="จำนวนภาพต่อการเรียก model.predict หนึ่งครั้ง (0 = ทั้งหมด)")
+    parser.add_argument('--max-side', type=int, default=DEFAULT_MAX_WORKING_SIDE,
+                        help="ย่อภาพให้ด้านที่ยาวที่สุดไม่เกินค่านี้ก่อนประมวลผล (0 = ใช้ความละเอียดเต็ม)")
+    parser.add_argument('--backend', choices=SEGMENTATION_BACKENDS, default='fused', help="วิธีหาตำแหน่งกล้วย")
+    parser.add_argument('--multi', action='store_true', help="ประเมินกล้วยทุกลูกในภาพ (หนึ่งแถวต่อกล้วยหนึ่งลูก)")
+    parser.add_argument('--no-recursive', action='store_true', help="ไม่ค้นหาในโฟลเดอร์ย่อย")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model) if args.model else load_serving_model()
+    paths = list(iter_image_paths(args.inputs, recursive=not args.no_recursive))
+
+    stream = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        writer = WRITERS[args.format](stream, MULTI_OUTPUT_FIELDS if args.multi else OUTPUT_FIELDS)
+        for row in score_paths(paths, model, workers=args.workers, batch_size=args.batch_size,
+                               max_working_side=args.max_side, backend=args.backend, multi=args.multi):
+            writer.write(row)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# --- benchmark_segmentation: เปรียบเทียบ backend ของ get_avg_color_rgb ---
+# วัดเวลาเฉลี่ย (latency) และหน่วยความจำสูงสุด (peak) ต่อภาพของแต่ละ backend บนภาพกล้วยสังเคราะห์
+# รวมถึง buffer ที่ backend 'fused' จองค้างไว้ใช้ซ้ำ (ไม่ถูกนับใน peak ของการเรียกครั้งถัดๆ ไป)
+# ตัวอย่างการใช้งาน:
+#   python benchmark_segmentation.py
+#   python benchmark_segmentation.py --sizes 640x480 4000x3000 --repeat 20
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from brix_engine import SEGMENTATION_BACKENDS, fused_buffer_nbytes, get_avg_color_rgb, release_fused_buffers
+
+
+def make_synthetic_banana(width, height, seed=0):
+    # สร้างภาพ RGB พื้นหลังสีเทาเข้ม มีกล้วยสีเหลือง (วงรี) อยู่กลางภาพ และเพิ่ม noise เล็กน้อย
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), 30, np.uint8)
+    cv2.ellipse(img, (width // 2, height // 2), (width // 4, height // 8), 20, 0, 360, (230, 200, 40), -1)
+    noise = rng.normal(0, 8, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+# สีกล้วย (RGB) ตั้งแต่ดิบจนสุกจัด เลือกให้ค่า Brix ที่ทำนายได้อยู่ห่างจากขอบของแต่ละระดับความสุก
+SYNTHETIC_BANANA_COLORS_RGB = (
+    (220, 195, 45),   # สุก (ระดับ 5)
+    (140, 180, 60),   # ดิบ สีเขียว (ระดับ 1)
+    (200, 190, 50),   # เริ่มสุก (ระดับ 3)
+    (210, 190, 45),   # สุกพอดี (ระดับ 4)
+    (190, 160, 60),   # สุกงอม (ระดับ 6)
+    (200, 150, 60),   # สุกจัด สีน้ำตาล (ระดับ 7)
+)
+
+
+def make_synthetic_scene(width, height, count, seed=0):
+    # ภาพที่มีกล้วย count ลูก (0 = ไม่มีกล้วย) วางในตารางไม่ให้ซ้อนกัน สีวนตาม SYNTHETIC_BANANA_COLORS_RGB
+    # ลูกถัดไปเล็กลงเรื่อยๆ ลูกแรกจึงเป็นลูกที่ใหญ่ที่สุดเสมอ (ผลของ get_avg_color_rgb ไม่กำกวม)
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), 30, np.uint8)
+    columns = int(np.ceil(np.sqrt(count))) if count else 1
+    rows = int(np.ceil(count / columns)) if count else 1
+    cell_w, cell_h = width // columns, height // rows
+    for index in range(count):
+        row, column = divmod(index, columns)
+        scale = 1.0 - 0.06 * index
+        center = (column * cell_w + cell_w // 2, row * cell_h + cell_h // 2)
+        axes = (max(1, int(cell_w * 0.32 * scale)), max(1, int(cell_h * 0.16 * scale)))
+        color = SYNTHETIC_BANANA_COLORS_RGB[index % len(SYNTHETIC_BANANA_COLORS_RGB)]
+        cv2.ellipse(img, center, axes, 20, 0, 360, color, -1)
+    # noise แบบ float32 (ภาพ 12MP ใช้หน่วยความจำครึ่งหนึ่งของ float64)
+    noise = rng.standard_normal(img.shape, dtype=np.float32) * 8
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def _traced_peak_mib(func):
+    # หน่วยความจำสูงสุดที่จองเพิ่มระหว่างเรียก func (numpy/OpenCV array ถูกติดตามผ่าน tracemalloc)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def measure(image, backend, repeat, max_working_side=None):
+    # คืนค่า (ผลลัพธ์, latency, peak ครั้งแรก, peak เมื่อ buffer พร้อมแล้ว, buffer ที่จองค้างไว้)
+    # backend 'fused' จอง buffer ครั้งแรกที่เจอภาพขนาดนี้ แล้วเก็บไว้ใช้ซ้ำตลอดอายุของ thread
+    # ค่า peak ครั้งแรก (cold) จึงรวมการจอง buffer, ส่วนค่า warm ไม่รวม และ buffer (MiB) คือส่วนที่ค้างอยู่
+    def run():
+        return get_avg_color_rgb(image, max_working_side=max_working_side, backend=backend)
+
+    release_fused_buffers()
+    cold_peak_mib = _traced_peak_mib(run)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = run()
+    latency_ms = (time.perf_counter() - start) / repeat * 1000
+    warm_peak_mib = _traced_peak_mib(run)
+    buffer_mib = fused_buffer_nbytes() / (1024 * 1024)
+    release_fused_buffers()
+    return result, latency_ms, cold_peak_mib, warm_peak_mib, buffer_mib
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="เปรียบเทียบเวลาและหน่วยความจำของ backend การหาตำแหน่งกล้วย")
+    parser.add_argument('--sizes', nargs='+', default=['640x480', '1920x1080', '4000x3000'], help="ขนาดภาพ กว้างxสูง")
+    parser.add_argument('--repeat', type=int, default=10, help="จำนวนรอบที่จับเวลาต่อขนาดภาพ")
+    parser.add_argument('--max-side', type=int, default=None, help="ทดสอบร่วมกับโหมดย่อภาพก่อนประมวลผล")
+    parser.add_argument('--threads', type=int, default=1, help="จำนวน thread ของ OpenCV (1 = เทียบแบบต่อ core)")
+    args = parser.parse_args(argv)
+
+    cv2.setNumThreads(args.threads)
+    print(f"{'size':>10} {'backend':>8} {'latency(ms)':>12} {'cold(MiB)':>10} {'warm(MiB)':>10} "
+          f"{'buffer(MiB)':>12}  mean RGB")
+    for size in args.sizes:
+        width, height = parse_size(size)
+        image = make_synthetic_banana(width, height)
+        for backend in SEGMENTATION_BACKENDS:
+            result, latency_ms, cold_mib, warm_mib, buffer_mib = measure(image, backend, args.repeat, args.max_side)
+            rgb = ', '.join('-' if v is None else f"{v:.1f}" for v in result)
+            print(f"{size:>10} {backend:>8} {latency_ms:>12.2f} {cold_mib:>10.1f} {warm_mib:>10.1f} "
+                  f"{buffer_mib:>12.1f}  ({rgb})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# --- benchmark_startup: วัดเวลา import และเวลาเริ่มต้น (cold start) ของแอปและ brix_engine ---
+# ทุกการวัดรันใน process ใหม่ (python -X importtime) เพื่อให้ได้เวลาแบบ cold start จริง
+# ตัวอย่างการใช้งาน:
+#   python benchmark_startup.py                       # แสดงโมดูลที่ใช้เวลา import มากที่สุด และเวลาวิเคราะห์ภาพแรก
+#   python benchmark_startup.py --json startup.json   # บันทึกผลเป็น JSON เพื่อเปรียบเทียบระหว่าง commit
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# โมดูลที่วัดเวลา import (streamlit วัดแยก เพื่อให้เห็นว่าเวลาส่วนใดมาจาก framework)
+DEFAULT_TARGETS = ['brix_engine', 'streamlit', 'brix_engine,brix_lut']
+
+# สคริปต์ที่รันใน process ใหม่: import -> โหลดโมเดล -> ถอดรหัสภาพ -> หาตำแหน่งกล้วย -> ทำนาย Brix
+COLD_START_SCRIPT = r'''
+import json, time
+start = time.perf_counter()
+import brix_engine
+imported = time.perf_counter()
+model = brix_engine.load_serving_model()
+loaded = time.perf_counter()
+import cv2, numpy as np
+image = np.full((960, 1280, 3), 30, np.uint8)
+cv2.ellipse(image, (640, 480), (320, 120), 20, 0, 360, (40, 200, 230), -1)
+image_bytes = cv2.imencode('.jpg', image)[1].tobytes()
+prepared = time.perf_counter()
+image_np = brix_engine.decode_image(image_bytes)
+decoded = time.perf_counter()
+rgb = brix_engine.get_avg_color_rgb(image_np, max_working_side=brix_engine.DEFAULT_MAX_WORKING_SIDE, backend='fused')
+segmented = time.perf_counter()
+brix_engine.score_rgb(model, *rgb)
+scored = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'load_model_ms': (loaded - imported) * 1000,
+    'decode_ms': (decoded - prepared) * 1000,
+    'segment_ms': (segmented - decoded) * 1000,
+    'predict_ms': (scored - segmented) * 1000,
+    'first_result_ms': (scored - start - (prepared - loaded)) * 1000,
+    'sklearn_imported': any(name.startswith('sklearn') for name in __import__('sys').modules),
+}))
+'''
+
+
+def parse_importtime(stderr):
+    # แปลงผลของ -X importtime เป็นรายการ (ชื่อโมดูล, self_us, cumulative_us, ระดับความลึก)
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure_imports(target, cwd):
+    statement = '; '.join(f'import {module}' for module in target.split(','))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                               cwd=cwd, capture_output=True, text=True, check=True)
+    rows = parse_importtime(completed.stderr)
+    # โมดูลระดับบนสุด (depth 0) คือสิ่งที่ถูก import ก่อนโดยตรง เวลา cumulative ของมันรวมโมดูลย่อยแล้ว
+    top_level = sorted((row for row in rows if row[3] <= 1), key=lambda row: row[2], reverse=True)
+    return {
+        'total_ms': sum(row[2] for row in rows if row[3] == 0) / 1000,
+        'modules': len(rows),
+        'top': [{'module': name, 'cumulative_ms': cumulative / 1000, 'self_ms': self_us / 1000}
+                for name, self_us, cumulative, _ in top_level],
+    }
+
+
+def measure_cold_start(cwd, repeat):
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], cwd=cwd,
+                                   capture_output=True, text=True, check=True)
+        runs.append(json.loads(completed.stdout))
+    # ใช้ค่ามัธยฐานของแต่ละขั้นตอน เพื่อลดผลของ cache ของระบบไฟล์และ noise
+    return {key: (statistics.median(run[key] for run in runs) if key.endswith('_ms') else runs[-1][key])
+            for key in runs[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="วัดเวลา import และ cold start ของแอปประเมินกล้วย")
+    parser.add_argument('--targets', nargs='+', default=DEFAULT_TARGETS,
+                        help="โมดูลที่ต้องการวัด (คั่นหลายโมดูลใน process เดียวด้วย ',')")
+    parser.add_argument('--repeat', type=int, default=5, help="จำนวนครั้งที่วัด cold start (ใช้ค่ามัธยฐาน)")
+    parser.add_argument('--top', type=int, default=10, help="จำนวนโมดูลที่แสดงต่อเป้าหมาย")
+    parser.add_argument('--json', help="บันทึกผลทั้งหมดเป็นไฟล์ JSON")
+    args = parser.parse_args(argv)
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = {'python': sys.version.split()[0], 'imports': {}, 'cold_start': None}
+    for target in args.targets:
+        report = measure_imports(target, cwd)
+        results['imports'][target] = report
+        print(f"import {target}: {report['total_ms']:.1f} ms ({report['modules']} โมดูล)")
+        for row in report['top'][:args.top]:
+            print(f"    {row['cumulative_ms']:8.1f} ms  {row['module']}")
+
+    results['cold_start'] = cold = measure_cold_start(cwd, args.repeat)
+    print("cold start (ค่ามัธยฐาน):")
+    for key, value in cold.items():
+        print(f"    {key:>16}: {value:.1f}" if key.endswith('_ms') else f"    {key:>16}: {value}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
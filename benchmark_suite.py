@@ -0,0 +1,208 @@
+# --- benchmark_suite: วัดประสิทธิภาพแบบทำซ้ำได้ บนภาพกล้วยสังเคราะห์หลายความละเอียด (VGA ถึง 12MP) และหลายจำนวนลูก ---
+# วัด latency (มัธยฐาน/p95), throughput (ภาพ/วินาที) และ peak RSS ของแต่ละเส้นทางการประมวลผล:
+#   segment = get_avg_color_rgb บนภาพที่ถอดรหัสแล้ว
+#   score   = ถอดรหัส JPEG -> get_avg_color_rgb -> score_rgb (เส้นทางเดียวกับ app.py / api_server.py)
+#   multi   = ถอดรหัส JPEG -> detect_bananas -> score_bananas (ทุกลูกในภาพ)
+# แต่ละกรณีรันใน process ใหม่ เพื่อให้ค่า peak RSS ของกรณีหนึ่งไม่ปนกับกรณีอื่น
+# ตัวอย่างการใช้งาน:
+#   python benchmark_suite.py --json bench_before.json
+#   python benchmark_suite.py --json bench_after.json --compare bench_before.json --max-regression 0.15
+#   python benchmark_suite.py --sizes VGA FHD --counts 1 --paths score --repeat 5
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from benchmark_segmentation import make_synthetic_scene, parse_size
+
+# ชื่อย่อของความละเอียดที่ใช้บ่อย (ระบุเป็น กว้างxสูง ได้เช่นกัน)
+NAMED_SIZES = {
+    'VGA': (640, 480),
+    'HD': (1280, 720),
+    'FHD': (1920, 1080),
+    '8MP': (3264, 2448),
+    '12MP': (4000, 3000),
+}
+BENCHMARK_PATHS = ('segment', 'score', 'multi')
+
+
+def resolve_size(text):
+    return NAMED_SIZES.get(text.upper()) or parse_size(text)
+
+
+def _peak_rss_mib():
+    # บน Linux ใช้ VmHWM ของ process นี้ เพราะ ru_maxrss ติดค่าสูงสุดของ process แม่มาด้วยหลัง fork/exec
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss เป็น KiB บน Linux แต่เป็น byte บน macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(path, image_bytes, repeat, max_working_side, backend, threads):
+    # ทำงานใน process ใหม่: โหลดโมเดล, warm-up 1 รอบ แล้วจับเวลาทีละรอบ
+    cv2.setNumThreads(threads)
+    from brix_engine import (decode_image, detect_bananas, get_avg_color_rgb, load_serving_model,
+                             score_bananas, score_rgb)
+
+    model = load_serving_model()
+    if path == 'segment':
+        image_array = decode_image(image_bytes)
+
+        def step():
+            rgb = get_avg_color_rgb(image_array, max_working_side=max_working_side, backend=backend)
+            return 0 if rgb[0] is None else 1
+    elif path == 'score':
+        def step():
+            rgb = get_avg_color_rgb(decode_image(image_bytes), max_working_side=max_working_side, backend=backend)
+            if rgb[0] is None:
+                return 0
+            score_rgb(model, *rgb)
+            return 1
+    else:
+        def step():
+            bananas = detect_bananas(decode_image(image_bytes), max_working_side=max_working_side)
+            return len(score_bananas(model, bananas))
+
+    baseline_rss = _peak_rss_mib()
+    found = step()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        step()
+        latencies.append((time.perf_counter() - start) * 1000)
+    peak_rss = _peak_rss_mib()
+
+    latencies.sort()
+    mean_ms = statistics.fmean(latencies)
+    return {
+        'bananas_found': found,
+        'latency_ms_median': statistics.median(latencies),
+        'latency_ms_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'latency_ms_mean': mean_ms,
+        'throughput_ips': 1000.0 / mean_ms if mean_ms else 0.0,
+        'peak_rss_mib': peak_rss,
+        'rss_growth_mib': peak_rss - baseline_rss,
+    }
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                    text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def case_key(row):
+    return (row['size'], row['count'], row['path'])
+
+
+def compare(results, baseline_results, max_regression):
+    # เทียบ latency มัธยฐานกับผลเดิม คืนค่ารายการกรณีที่ช้าลงเกิน max_regression (สัดส่วน เช่น 0.15 = 15%)
+    baseline = {case_key(row): row for row in baseline_results}
+    regressions = []
+    print(f"\n{'size':>10} {'count':>5} {'path':>8} {'before(ms)':>11} {'after(ms)':>10} {'change':>8}")
+    for row in results:
+        before = baseline.get(case_key(row))
+        if before is None:
+            continue
+        change = row['latency_ms_median'] / before['latency_ms_median'] - 1.0
+        flag = ''
+        if max_regression is not None and change > max_regression:
+            regressions.append(row)
+            flag = '  <-- ช้าลง'
+        print(f"{row['size']:>10} {row['count']:>5} {row['path']:>8} {before['latency_ms_median']:>11.2f} "
+              f"{row['latency_ms_median']:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="วัดประสิทธิภาพการประเมินกล้วยบนภาพสังเคราะห์ และบันทึกผลเป็น JSON")
+    parser.add_argument('--sizes', nargs='+', default=list(NAMED_SIZES),
+                        help="ขนาดภาพ: VGA, HD, FHD, 8MP, 12MP หรือ กว้างxสูง")
+    parser.add_argument('--counts', nargs='+', type=int, default=[0, 1, 4], help="จำนวนกล้วยในภาพ (0 = ไม่มีกล้วย)")
+    parser.add_argument('--paths', nargs='+', default=list(BENCHMARK_PATHS), choices=BENCHMARK_PATHS)
+    parser.add_argument('--repeat', type=int, default=10, help="จำนวนรอบที่จับเวลาต่อกรณี")
+    parser.add_argument('--max-side', type=int, default=1280, help="ด้านยาวสูงสุดก่อนหาตำแหน่งกล้วย (0 = ความละเอียดเต็ม)")
+    parser.add_argument('--backend', default='fused', help="วิธีหาตำแหน่งกล้วยของเส้นทาง segment/score")
+    parser.add_argument('--threads', type=int, default=1, help="จำนวน thread ของ OpenCV (1 = เทียบแบบต่อ core)")
+    parser.add_argument('--seed', type=int, default=0, help="seed ของภาพสังเคราะห์")
+    parser.add_argument('--json', help="บันทึกผลเป็นไฟล์ JSON")
+    parser.add_argument('--compare', help="ไฟล์ JSON ผลเดิมที่ต้องการเปรียบเทียบ")
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help="ออกด้วย exit code 1 ถ้า latency มัธยฐานช้าลงเกินสัดส่วนนี้ (ใช้ร่วมกับ --compare)")
+    args = parser.parse_args(argv)
+
+    max_working_side = args.max_side or None
+    # ใช้ spawn เพื่อให้ทุกกรณีเริ่มจาก process ใหม่จริง (ไม่สืบทอดหน่วยความจำของ process หลัก)
+    context = multiprocessing.get_context('spawn')
+    results = []
+    print(f"{'size':>10} {'count':>5} {'path':>8} {'found':>5} {'median(ms)':>11} {'p95(ms)':>9} "
+          f"{'img/s':>8} {'peakRSS':>8} {'growth':>7}")
+    for size in args.sizes:
+        width, height = resolve_size(size)
+        for count in args.counts:
+            image = make_synthetic_scene(width, height, count, seed=args.seed)
+            # JPEG คุณภาพคงที่ เพื่อให้เส้นทาง score/multi รวมเวลาถอดรหัสเหมือนภาพที่ผู้ใช้อัปโหลด
+            image_bytes = cv2.imencode('.jpg', cv2.cvtColor(image, cv2.COLOR_RGB2BGR),
+                                       [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+            del image
+            for path in args.paths:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    row = pool.submit(run_case, path, image_bytes, args.repeat, max_working_side,
+                                      args.backend, args.threads).result()
+                row = {'size': size, 'width': width, 'height': height, 'count': count, 'path': path, **row}
+                results.append(row)
+                print(f"{size:>10} {count:>5} {path:>8} {row['bananas_found']:>5} "
+                      f"{row['latency_ms_median']:>11.2f} {row['latency_ms_p95']:>9.2f} "
+                      f"{row['throughput_ips']:>8.1f} {row['peak_rss_mib']:>7.0f}M {row['rss_growth_mib']:>6.0f}M")
+
+    report = {
+        'environment': environment_info(),
+        'settings': {'repeat': args.repeat, 'max_side': args.max_side, 'backend': args.backend,
+                     'threads': args.threads, 'seed': args.seed},
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.max_regression)
+        if regressions:
+            print(f"\nช้าลงเกิน {args.max_regression:.0%}: {len(regressions)} กรณี")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,529 @@
+# --- brix_engine: ส่วนประมวลผลภาพและทำนาย Brix ที่ไม่ขึ้นกับ Streamlit ---
+# แยกออกมาจาก app.py เพื่อให้เรียกใช้ได้ทั้งจากหน้าเว็บ และจากสคริปต์ประมวลผลแบบ batch
+import io
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from pipeline_metrics import clock, incr, lap, observe_resolution
+
+# หมายเหตุ: joblib (ซึ่งจะโหลด scikit-learn ตอน unpickle) และ PIL ถูก import ภายในฟังก์ชันที่ใช้เท่านั้น
+# เพื่อให้การ import โมดูลนี้ (และการเริ่มต้นแอป) เร็วที่สุด
+
+# พาธเริ่มต้นของโมเดลที่ฝึกไว้ (อยู่ในโฟลเดอร์เดียวกับไฟล์นี้ใน GitHub Repository)
+DEFAULT_MODEL_PATH = 'banana_brix_model.pkl'
+# ตาราง lookup (RGB -> Brix) ที่คอมไพล์จากโมเดลด้านบนด้วย: python brix_lut.py
+DEFAULT_LUT_PATH = 'banana_brix_lut.npy'
+# ตาราง lookup ของโมเดลที่ฝึกต่อด้วย python retrain.py fit (ไม่อยู่ใน git; ถ้ามีไฟล์นี้แอปจะใช้แทนตารางด้านบน)
+ONLINE_LUT_PATH = 'banana_brix_lut.online.npy'
+
+# ความละเอียดสูงสุด (ด้านที่ยาวที่สุด, pixel) ที่ใช้ประมวลผลเมื่อเปิดโหมดย่อภาพก่อน
+# ภาพจากกล้องมือถือ 12MP (4000x3000) จะถูกย่อลงเหลือ 1000x750 ซึ่งยังให้ค่าสีเฉลี่ยที่นิ่งพอ
+DEFAULT_MAX_WORKING_SIDE = 1280
+
+# --- ฟังก์ชันย่อภาพก่อนประมวลผล (สำหรับภาพความละเอียดสูง) ---
+def downscale_for_segmentation(image_array, max_working_side):
+    # ย่อภาพทีละครึ่งด้วย image pyramid (cv2.pyrDown จะ blur ก่อนย่อ จึงไม่เกิด aliasing)
+    # จนกว่าด้านที่ยาวที่สุดจะไม่เกิน max_working_side
+    # คืนค่า (ภาพที่ย่อแล้ว, อัตราส่วนพื้นที่ภาพย่อ/ภาพเดิม) เพื่อนำไปปรับเกณฑ์พื้นที่ขั้นต่ำ
+    if not max_working_side:
+        return image_array, 1.0
+    img = image_array
+    while max(img.shape[:2]) > max_working_side:
+        img = cv2.pyrDown(img)
+    area_scale = (img.shape[0] * img.shape[1]) / float(image_array.shape[0] * image_array.shape[1])
+    return img, area_scale
+
+# --- ค่าคงที่ที่ใช้ร่วมกันในการหาตำแหน่งกล้วย ---
+# Step 1: กำหนดช่วงสีของกล้วยในรูปแบบ BGR (ปรับปรุงช่วงสี)
+# ค่าเหล่านี้อาจต้องปรับจูนอีกครั้ง หากพบว่าตรวจจับกล้วยบางสีไม่ได้
+# B = Blue, G = Green, R = Red
+lower_banana_color_bgr = np.array([0, 70, 60])    # สีค่อนไปทางน้ำเงิน/เขียวน้อยๆ, แดง/ส้มน้อยๆ
+upper_banana_color_bgr = np.array([140, 255, 255]) # สีค่อนไปทางน้ำเงินปานกลาง, เขียว/แดงสูงสุด (ครอบคลุมเหลือง-ส้ม-เขียว)
+
+# Kernel คือขนาดของตัวกรองที่ใช้ในการดำเนินการ Morphological (สร้างครั้งเดียว ใช้ซ้ำทุกภาพ)
+morph_kernel = np.ones((5, 5), np.uint8) # ขนาด 5x5 pixel
+
+# วิธีหาตำแหน่งกล้วยที่เลือกใช้ได้ใน get_avg_color_rgb(backend=...)
+# 'contour' = วิธีเดิม (erode/dilate + findContours + drawContours)
+# 'fused'   = ไม่แปลงเป็น BGR, ใช้ morphologyEx คำสั่งเดียว, ใช้ buffer ซ้ำไม่จอง array ใหม่ทุกภาพ
+#             และวาด Mask/คำนวณค่าเฉลี่ยเฉพาะในกรอบของกล้วย (ผลลัพธ์เท่ากับ 'contour')
+SEGMENTATION_BACKENDS = ('contour', 'fused')
+
+# --- ฟังก์ชัน get_avg_color_rgb (สำหรับประมวลผลสี) ---
+def get_avg_color_rgb(image_array, max_working_side=None, min_banana_pixel_area=3000, backend='contour'):
+    # max_working_side: ถ้ากำหนดค่า จะย่อภาพก่อนสร้าง Mask และคำนวณค่าเฉลี่ยบนภาพที่ย่อแล้ว
+    # (None = ประมวลผลที่ความละเอียดเต็มเหมือนเดิม)
+    # min_banana_pixel_area: เกณฑ์พื้นที่ขั้นต่ำ ในหน่วย pixel ของภาพต้นฉบับ
+    # backend: วิธีหาตำแหน่งกล้วย ดู SEGMENTATION_BACKENDS
+    # (เวลาแต่ละขั้นตอนถูกบันทึกด้วย clock()/lap() เมื่อเปิด pipeline_metrics เท่านั้น)
+    if backend not in SEGMENTATION_BACKENDS:
+        raise ValueError(f"ไม่รู้จัก backend '{backend}' (เลือกได้: {', '.join(SEGMENTATION_BACKENDS)})")
+    incr('images_processed')
+    observe_resolution(image_array)
+    t = clock()
+    img, area_scale = downscale_for_segmentation(image_array, max_working_side)
+    t = lap('downscale', t)
+    if backend == 'fused':
+        result = _get_avg_color_rgb_fused(img, min_banana_pixel_area * area_scale, t)
+        if result[0] is None:
+            incr('no_banana')
+        return result
+
+    # image_array ที่รับเข้ามาจาก Streamlit จะเป็น RGB (PIL Image)
+    # แต่ OpenCV (cv2) โดยทั่วไปทำงานกับ BGR ดังนั้นต้องแปลงก่อน
+    img_bgr = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    t = lap('cvtColor', t)
+
+    # ลด Noise ด้วย Gaussian Blur (ลองปรับค่า kernel_size หากจำเป็น)
+    # ช่วยให้การตรวจจับสีและรูปร่างดีขึ้น
+    blurred = cv2.GaussianBlur(img_bgr, (5, 5), 0)
+    t = lap('blur', t)
+
+    # Step 2: สร้าง Mask เพื่อกรองพิกเซลที่อยู่ในช่วงสีที่กำหนด (ช่วงสีดู Step 1 ด้านบน)
+    color_mask = cv2.inRange(blurred, lower_banana_color_bgr, upper_banana_color_bgr)
+    t = lap('inRange', t)
+
+    # Step 3: ใช้ Morphological Operations (Erosion and Dilation) เพื่อลด Noise และเติมเต็มรู
+    eroded = cv2.erode(color_mask, morph_kernel, iterations=2) # กัดกร่อน 2 ครั้ง (ลบจุดเล็กๆ)
+    dilated = cv2.dilate(eroded, morph_kernel, iterations=2) # ขยาย 2 ครั้ง (เติมเต็มช่องว่าง)
+    t = lap('morphology', t)
+
+    # Step 4: หา Contours (โครงร่างของวัตถุที่เชื่อมต่อกัน) ใน Mask ที่ปรับปรุงแล้ว
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    t = lap('findContours', t)
+
+    # Step 5: หา Contours ที่มีพื้นที่ใหญ่ที่สุด (สันนิษฐานว่าเป็นกล้วย)
+    max_area = 0
+    largest_contour = None
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area > max_area:
+            max_area = area
+            largest_contour = contour
+    t = lap('selectContour', t)
+
+    # Step 6: กำหนดเกณฑ์ขั้นต่ำของพื้นที่พิกเซลที่ยอมรับว่าเป็นกล้วย
+    # **สำคัญมาก: ปรับค่านี้ตามขนาดของกล้วยในภาพถ่ายของคุณครู**
+    # ถ้าภาพกล้วยมีขนาดเล็กในภาพรวม ค่านี้ก็ควรน้อยลง ถ้าภาพใหญ่ชัดเจน ก็อาจเพิ่มค่าได้
+    # ค่าเริ่มต้น 3000 ลองปรับเพิ่ม/ลด หากพบว่าตรวจจับผิดพลาด
+    # เมื่อภาพถูกย่อ ต้องย่อเกณฑ์ตามอัตราส่วนพื้นที่ด้วย เพื่อให้ผลการตรวจจับเท่าเดิม
+    min_banana_pixel_area = min_banana_pixel_area * area_scale
+
+    # Step 7: ตรวจสอบว่าพบวัตถุที่ใหญ่พอและมีลักษณะเป็นสีของกล้วยหรือไม่
+    if largest_contour is None or max_area < min_banana_pixel_area:
+        # หากไม่พบวัตถุขนาดใหญ่พอ หรือไม่มีวัตถุที่อยู่ในช่วงสีที่กำหนด
+        incr('no_banana')
+        return None, None, None # คืนค่า None เพื่อแจ้งว่าไม่พบกล้วย/ประมวลผลไม่ได้
+
+    # Step 8: สร้าง Mask ใหม่ที่มีเฉพาะวัตถุที่ใหญ่ที่สุด (กล้วย) เท่านั้น
+    final_mask = np.zeros(img_bgr.shape[:2], dtype="uint8") # สร้าง Mask สีดำเปล่าๆ ขนาดเท่าภาพ
+    cv2.drawContours(final_mask, [largest_contour], -1, 255, -1) # วาดโครงร่างที่ใหญ่ที่สุดให้เป็นสีขาว (255) ลงบน Mask นั้น
+    t = lap('drawContours', t)
+
+    # Step 9: คำนวณค่าเฉลี่ย BGR ของพิกเซล โดยใช้ Mask สุดท้ายนี้ (เฉพาะส่วนที่เป็นกล้วย)
+    # ใช้ 'blurred' image ในการคำนวณค่าเฉลี่ย เพื่อลดผลกระทบจาก noise
+    mean_bgr = cv2.mean(blurred, mask=final_mask)[:3]
+    lap('mean', t)
+
+    # แปลง BGR เฉลี่ยกลับเป็น RGB เพื่อให้เข้ากับการแสดงผล
+    avg_red = mean_bgr[2]
+    avg_green = mean_bgr[1]
+    avg_blue = mean_bgr[0]
+
+    return avg_red, avg_green, avg_blue
+
+# --- backend 'fused': หาตำแหน่งกล้วยแบบลดการจองหน่วยความจำ ---
+# ช่วงสีในลำดับ RGB: GaussianBlur/inRange ทำงานแยกทีละช่องสี จึงไม่ต้องแปลงภาพเป็น BGR ก่อน
+_lower_banana_color_rgb = lower_banana_color_bgr[::-1].copy()
+_upper_banana_color_rgb = upper_banana_color_bgr[::-1].copy()
+
+class _FusedBuffers(threading.local):
+    # buffer ที่จองไว้ใช้ซ้ำ แยกกันต่อ thread (และต่อ process ใน process pool)
+    # จองใหม่เฉพาะเมื่อขนาดภาพเปลี่ยน; labels (int32 ใหญ่กว่า mask 4 เท่า) จองเฉพาะเมื่อ detect_bananas ใช้
+    def __init__(self):
+        self.shape = None
+        self.labels = None
+
+    def get(self, shape):
+        if self.shape != shape:
+            height, width = shape[:2]
+            self.blurred = np.empty((height, width, 3), np.uint8)
+            self.mask = np.empty((height, width), np.uint8)
+            self.object_mask = np.empty((height, width), np.uint8)
+            self.labels = None
+            self.shape = shape
+        return self
+
+    def get_labels(self):
+        if self.labels is None:
+            self.labels = np.empty(self.shape[:2], np.int32)
+        return self.labels
+
+    def nbytes(self):
+        if self.shape is None:
+            return 0
+        arrays = (self.blurred, self.mask, self.object_mask, self.labels)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def release(self):
+        self.shape = None
+        self.blurred = self.mask = self.object_mask = self.labels = None
+
+_fused_buffers = _FusedBuffers()
+
+def fused_buffer_nbytes():
+    # หน่วยความจำที่ buffer ของ backend 'fused' ใน thread นี้จองค้างไว้ตลอดอายุของ thread
+    return _fused_buffers.nbytes()
+
+def release_fused_buffers():
+    # คืนหน่วยความจำของ buffer ใน thread นี้ (จองใหม่อัตโนมัติเมื่อเรียกใช้ครั้งถัดไป)
+    _fused_buffers.release()
+
+def _as_rgb_uint8(img):
+    # buffer ของ backend 'fused' เป็น uint8 3 ช่องสีเสมอ ถ้า input ไม่ตรง OpenCV จะจอง array ใหม่ให้เงียบๆ
+    # แล้วประมวลผลต่อบน buffer ที่ยังไม่มีค่า จึงต้องแปลงภาพ RGBA/ขาวดำ ให้เป็น RGB ก่อน
+    if img.dtype != np.uint8:
+        raise ValueError(f"ภาพต้องเป็น uint8 (ได้ {img.dtype})")
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+    if img.ndim == 3 and img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
+    if img.ndim != 3 or img.shape[2] != 3:
+        raise ValueError(f"ภาพต้องมี 3 ช่องสี (RGB) ได้ขนาด {img.shape}")
+    return img
+
+def _find_banana_contours_fused(img_rgb, t=None):
+    # คืนค่า (buffer ที่มีภาพ blurred, รายการ contour ภายนอกของวัตถุสีกล้วยทั้งหมด, เวลาสำหรับ lap() ถัดไป)
+    img_rgb = _as_rgb_uint8(img_rgb)
+    buf = _fused_buffers.get(img_rgb.shape)
+
+    # ลด Noise และสร้าง Mask ตามช่วงสี (เขียนผลลงใน buffer เดิม)
+    cv2.GaussianBlur(img_rgb, (5, 5), 0, dst=buf.blurred)
+    t = lap('blur', t)
+    cv2.inRange(buf.blurred, _lower_banana_color_rgb, _upper_banana_color_rgb, dst=buf.mask)
+    t = lap('inRange', t)
+
+    # erode 2 ครั้ง + dilate 2 ครั้ง = Morphological Opening ในคำสั่งเดียว (ทำในที่เดิม)
+    cv2.morphologyEx(buf.mask, cv2.MORPH_OPEN, morph_kernel, dst=buf.mask, iterations=2)
+    t = lap('morphology', t)
+
+    contours, _ = cv2.findContours(buf.mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    t = lap('findContours', t)
+    return buf, contours, t
+
+def _select_largest_contour(contours, min_banana_pixel_area):
+    # คืนค่า (contour ที่ใหญ่ที่สุด, พื้นที่) หรือ (None, 0.0) ถ้าไม่มีวัตถุที่ใหญ่พอ
+    # (เลือกแบบเดียวกับ backend 'contour' ผลลัพธ์จึงเท่ากัน)
+    if not contours:
+        return None, 0.0
+    areas = [cv2.contourArea(contour) for contour in contours]
+    largest_index = int(np.argmax(areas))
+    if areas[largest_index] <= 0 or areas[largest_index] < min_banana_pixel_area:
+        return None, 0.0
+    return contours[largest_index], areas[largest_index]
+
+def _banana_roi(buf, contour):
+    # วาด Mask เฉพาะในกรอบสี่เหลี่ยมที่ล้อมกล้วย (แทนการวาดทั้งภาพ) คืนค่า (ส่วนของภาพ blurred ในกรอบ, Mask)
+    # ใช้ร่วมกันระหว่างค่าสีที่ให้บริการ (get_avg_color_rgb) และคุณลักษณะที่เก็บใน feature store ให้ได้ค่าตรงกันเสมอ
+    x, y, w, h = cv2.boundingRect(contour)
+    object_mask = buf.object_mask[:h, :w]
+    object_mask.fill(0)
+    cv2.drawContours(object_mask, [contour], -1, 255, -1, offset=(-x, -y))
+    return buf.blurred[y:y + h, x:x + w], object_mask
+
+def _get_avg_color_rgb_fused(img_rgb, min_banana_pixel_area, t=None):
+    buf, contours, t = _find_banana_contours_fused(img_rgb, t)
+    largest_contour, _ = _select_largest_contour(contours, min_banana_pixel_area)
+    if largest_contour is None:
+        return None, None, None
+    t = lap('selectContour', t)
+
+    roi, object_mask = _banana_roi(buf, largest_contour)
+    t = lap('drawContours', t)
+    avg_red, avg_green, avg_blue = cv2.mean(roi, mask=object_mask)[:3]
+    lap('mean', t)
+    return avg_red, avg_green, avg_blue
+
+# --- คุณลักษณะเพิ่มเติมของกล้วย (สำหรับเก็บใน feature store และฝึกโมเดลใหม่ ดู retrain.py) ---
+# ช่วงสีของจุดสีน้ำตาล/ดำบนเปลือก ในรูปแบบ HSV ของ OpenCV (H 0-180): สีส้มถึงน้ำตาลที่ค่อนข้างมืด
+# กล้วยสีเหลืองปกติมีค่า V สูงกว่า 130 จึงไม่ถูกนับ
+brown_spot_lower_hsv = np.array([0, 60, 20])
+brown_spot_upper_hsv = np.array([30, 255, 130])
+
+BANANA_FEATURE_COLUMNS = ('R', 'G', 'B', 'H', 'S', 'V', 'brown_fraction', 'area')
+
+def extract_banana_features(image_array, max_working_side=None, min_banana_pixel_area=3000):
+    # หากล้วยลูกที่ใหญ่ที่สุด (เหมือน get_avg_color_rgb แบบ 'fused') แล้วคืนค่า dict ตาม BANANA_FEATURE_COLUMNS:
+    # ค่าเฉลี่ย R, G, B และ H, S, V ภายใน Mask, สัดส่วนพื้นที่จุดสีน้ำตาล และพื้นที่ (pixel ของภาพต้นฉบับ)
+    # คืนค่า None ถ้าไม่พบกล้วย
+    img, area_scale = downscale_for_segmentation(image_array, max_working_side)
+    buf, contours, _ = _find_banana_contours_fused(img)
+    largest_contour, area = _select_largest_contour(contours, min_banana_pixel_area * area_scale)
+    if largest_contour is None:
+        return None
+
+    roi, object_mask = _banana_roi(buf, largest_contour)
+    avg_red, avg_green, avg_blue = cv2.mean(roi, mask=object_mask)[:3]
+    roi_hsv = cv2.cvtColor(roi, cv2.COLOR_RGB2HSV)
+    avg_hue, avg_saturation, avg_value = cv2.mean(roi_hsv, mask=object_mask)[:3]
+    brown = cv2.inRange(roi_hsv, brown_spot_lower_hsv, brown_spot_upper_hsv)
+    cv2.bitwise_and(brown, object_mask, dst=brown)
+    return {
+        'R': avg_red, 'G': avg_green, 'B': avg_blue,
+        'H': avg_hue, 'S': avg_saturation, 'V': avg_value,
+        'brown_fraction': cv2.countNonZero(brown) / float(max(cv2.countNonZero(object_mask), 1)),
+        'area': area / area_scale,
+    }
+
+# --- ฟังก์ชันตรวจจับกล้วยหลายลูกในภาพเดียว (เช่น ภาพหวีกล้วย หรือถาดบนสายพาน) ---
+def detect_bananas(image_array, max_working_side=None, min_banana_pixel_area=3000):
+    # คืนค่ารายการ dict ของกล้วยทุกลูกที่มีพื้นที่ไม่น้อยกว่า min_banana_pixel_area (เรียงจากใหญ่ไปเล็ก)
+    # แต่ละ dict มี bbox (x, y, w, h), area (pixel) ในพิกัดของภาพต้นฉบับ และค่าสีเฉลี่ย R, G, B
+    incr('images_processed')
+    observe_resolution(image_array)
+    t = clock()
+    img, area_scale = downscale_for_segmentation(image_array, max_working_side)
+    t = lap('downscale', t)
+    buf, contours, t = _find_banana_contours_fused(img, t)
+
+    min_area = min_banana_pixel_area * area_scale
+    bananas = [(cv2.contourArea(contour), contour) for contour in contours]
+    bananas = [item for item in bananas if item[0] > 0 and item[0] >= min_area]
+    bananas.sort(key=lambda item: item[0], reverse=True)
+    t = lap('selectContour', t)
+    if not bananas:
+        incr('no_banana')
+        return []
+
+    # วาดกล้วยแต่ละลูกลงใน label image (0 = พื้นหลัง, 1..N = กล้วยลูกที่ 1..N)
+    # แล้วหาผลรวมสีของทุกลูกพร้อมกันด้วย np.bincount ครั้งเดียวต่อช่องสี
+    labels = buf.get_labels()
+    labels.fill(0)
+    for label, (_, contour) in enumerate(bananas, start=1):
+        cv2.drawContours(labels, [contour], -1, label, -1)
+    t = lap('drawContours', t)
+    flat_labels = labels.ravel()
+    num_labels = len(bananas) + 1
+    counts = np.bincount(flat_labels, minlength=num_labels)[1:]
+    pixels = buf.blurred.reshape(-1, 3)
+    sums = np.stack([np.bincount(flat_labels, weights=pixels[:, channel], minlength=num_labels)[1:]
+                     for channel in range(3)], axis=1)
+    means = sums / np.maximum(counts, 1)[:, None]
+    lap('mean', t)
+    incr('bananas_detected', len(bananas))
+
+    # แปลงพิกัดจากภาพที่ย่อกลับเป็นพิกัดของภาพต้นฉบับ
+    scale_y = image_array.shape[0] / float(img.shape[0])
+    scale_x = image_array.shape[1] / float(img.shape[1])
+    results = []
+    for (area, contour), (avg_red, avg_green, avg_blue) in zip(bananas, means):
+        x, y, w, h = cv2.boundingRect(contour)
+        results.append({
+            'bbox': (int(round(x * scale_x)), int(round(y * scale_y)), int(round(w * scale_x)), int(round(h * scale_y))),
+            'area': area / area_scale,
+            'R': float(avg_red),
+            'G': float(avg_green),
+            'B': float(avg_blue),
+        })
+    return results
+
+# --- ฟังก์ชันคำนวณปริมาณน้ำตาลที่ควรได้รับต่อวัน ---
+def calculate_daily_sugar_allowance(age, weight, height, gender, is_patient, needs_weight_loss):
+    # Mifflin-St Jeor Equation for BMR (Basal Metabolic Rate)
+    if gender == "ชาย":
+        bmr = (10 * weight) + (6.25 * height) - (5 * age) + 5
+    else: # หญิง
+        bmr = (10 * weight) + (6.25 * height) - (5 * age) - 161
+
+    # Activity factor for TDEE (Total Daily Energy Expenditure) - Simplified
+    # Can expand this with more activity levels if needed
+    activity_factor = 1.2 # Sedentary (little to no exercise)
+    tdee = bmr * activity_factor
+
+    # Convert TDEE to recommended sugar intake (approx.)
+    # WHO recommends free sugars not exceeding 10% of total energy intake, ideally < 5%.
+    # 1 gram of sugar is approx. 4 kilocalories.
+    
+    # Let's use 5% of TDEE as a target for sugar for health-conscious/weight loss.
+    # And 10% as a general maximum.
+    
+    # For weight loss or patients, aim for a lower percentage.
+    if needs_weight_loss or is_patient:
+        target_sugar_calories_percent = 0.05 # 5% of TDEE
+    else:
+        target_sugar_calories_percent = 0.10 # 10% of TDEE
+
+    daily_sugar_calories = tdee * target_sugar_calories_percent
+    daily_sugar_grams = daily_sugar_calories / 4 # 1g sugar = 4 kcal
+
+    return daily_sugar_grams
+
+# --- ฟังก์ชันประเมินระดับความสุกและให้คำแนะนำจากค่า Brix ---
+# ปรับช่วงค่า Brix และคำอธิบายตามความเหมาะสมกับข้อมูลของคุณครู
+def predict_ripeness(brix_value):
+    ripeness_level_num = 0 # กำหนดค่าเริ่มต้น
+    status_desc = ""
+    advice_text = ""
+
+    # คำนวณร้อยละความสุก (Brix 0% = 0, Brix 30% = 100%)
+    # ค่า 30.0 เป็นค่า Brix สูงสุดที่คาดการณ์ว่าเป็นสุกจัดเต็มที่
+    percentage_ripeness = min(100.0, max(0.0, (brix_value / 30.0) * 100.0))
+
+    if brix_value <= 5.0:
+        ripeness_level_num = 1
+        status_desc = "กล้วยน้ำว้าดิบ"
+        advice_text = "⭐️ กล้วยยังดิบอยู่ มีแป้งสูงมาก ควรบ่มต่อในที่แห้ง มีอากาศถ่ายเท หรือบ่มร่วมกับผลไม้ที่ปล่อยก๊าซเอทิลีน (เช่น แอปเปิล) อาจใช้เวลา 5-7 วันเพื่อให้สุกตามต้องการ"
+    elif 5.0 < brix_value <= 8.0:
+        ripeness_level_num = 2
+        status_desc = "กล้วยน้ำว้าดิบ (เริ่มอมเหลือง)"
+        advice_text = "✨ กล้วยยังดิบอยู่แต่เริ่มมีสัญญาณการสุก ควรบ่มต่อประมาณ 3-5 วัน เพื่อให้ได้ความหวานที่เพิ่มขึ้น"
+    elif 8.0 < brix_value <= 12.0:
+        ripeness_level_num = 3
+        status_desc = "กล้วยน้ำว้าที่เริ่มสุก (เหลืองปนเขียว)"
+        advice_text = "😊 กล้วยเริ่มสุกแล้ว เนื้อเริ่มนิ่ม รสชาติไม่หวานจัด สามารถรับประทานได้สำหรับผู้ที่ชอบกล้วยไม่หวานมาก หรือบ่มต่อ 2-3 วันให้สุกนิ่มขึ้น"
+    elif 12.0 < brix_value <= 18.0:
+        ripeness_level_num = 4
+        status_desc = "กล้วยน้ำว้าสุกพอดี (เหลืองทั้งผล)"
+        advice_text = "😋 กล้วยสุกกำลังดี เนื้อนิ่ม หวานอร่อย เหมาะสำหรับการรับประทานสด หรือนำไปประกอบอาหารที่ไม่ต้องการความหวานมาก"
+    elif 18.0 < brix_value <= 22.0:
+        ripeness_level_num = 5
+        status_desc = "กล้วยน้ำว้าสุก (มีจุดน้ำตาลเล็กน้อย)"
+        advice_text = "👌 กล้วยสุกกำลังดีถึงสุกงอมเล็กน้อย เนื้อนิ่ม หวานจัด สามารถรับประทานสด หรือนำไปแปรรูปเป็นกล้วยบวชชี หรือเค้กกล้วยหอมได้เลย"
+    elif 22.0 < brix_value <= 25.0:
+        ripeness_level_num = 6
+        status_desc = "กล้วยน้ำว้าสุกงอม (มีจุดน้ำตาลมาก)"
+        advice_text = "😉 กล้วยสุกงอม มีความหวานมาก เนื้อนิ่มมาก อาจมีจุดดำบนเปลือก สามารถนำไปแปรรูปทันที เช่น ทำกล้วยเชื่อม กล้วยฉาบ กล้วยตาก หรือทำขนมหวานได้"
+    else: # brix_value > 25.0
+        ripeness_level_num = 7
+        status_desc = "กล้วยน้ำว้าที่สุกจัดมาก (น้ำตาลเกือบทั้งผล)"
+        advice_text = "👍 กล้วยสุกจัดมาก เนื้อนิ่มเละ หวานจัด เหมาะสำหรับนำไปแปรรูปทันที เช่น ทำกล้วยบวดชี เค้กกล้วยหอม สมูทตี้ หรือแยม"
+    
+    return ripeness_level_num, status_desc, advice_text, percentage_ripeness
+
+# --- ตารางช่วงค่า Brix ของแต่ละระดับความสุก (ตรงกับเงื่อนไขใน predict_ripeness) ---
+# ขอบบนของระดับ 1-6 (ระดับ 7 คือ Brix > 25.0) ใช้หาระดับความสุกของค่า Brix หลายค่าพร้อมกัน
+RIPENESS_BAND_UPPER_BRIX = np.array([5.0, 8.0, 12.0, 18.0, 22.0, 25.0])
+
+def ripeness_levels(brix_values):
+    # คืนค่าระดับความสุก (1-7) และร้อยละความสุก ของ array ค่า Brix โดยไม่ต้องวนเรียก predict_ripeness ทีละค่า
+    brix_values = np.asarray(brix_values, dtype=np.float64)
+    levels = np.searchsorted(RIPENESS_BAND_UPPER_BRIX, brix_values, side='left') + 1
+    percentages = np.clip(brix_values / 30.0 * 100.0, 0.0, 100.0)
+    return levels, percentages
+
+# --- ฟังก์ชันโหลดโมเดลและอ่านภาพ ---
+def load_model(model_path=DEFAULT_MODEL_PATH):
+    # ไฟล์ .npy คือตาราง lookup ที่คอมไพล์จากโมเดล (ดู brix_lut.py) ใช้งานได้โดยไม่ต้อง import scikit-learn
+    if model_path.endswith('.npy'):
+        from brix_lut import BrixLUT
+        return BrixLUT.load(model_path)
+    import joblib
+    return joblib.load(model_path)
+
+def base_model_path():
+    # โมเดลตั้งต้นที่อยู่ใน repo: ใช้ตาราง lookup ถ้ามีไฟล์อยู่ (เร็วกว่าและไม่ต้องโหลด scikit-learn)
+    return DEFAULT_LUT_PATH if os.path.exists(DEFAULT_LUT_PATH) else DEFAULT_MODEL_PATH
+
+def serving_model_path():
+    # ใช้ตาราง lookup ของโมเดลที่ฝึกต่อถ้ามี ไม่เช่นนั้นใช้โมเดลตั้งต้น
+    return ONLINE_LUT_PATH if os.path.exists(ONLINE_LUT_PATH) else base_model_path()
+
+def load_serving_model():
+    return load_model(serving_model_path())
+
+class ReloadingModel:
+    # ใช้แทนโมเดลได้โดยตรง (มีเมธอด predict) และโหลดไฟล์โมเดลใหม่เองเมื่อไฟล์ถูกแทนที่
+    # (เช่น หลัง python retrain.py fit เขียนตาราง lookup ใหม่) โดยไม่ต้อง restart แอปหรือ API
+    # ตรวจเวลาแก้ไขไฟล์ไม่บ่อยกว่าทุก check_interval วินาที; model_path=None = ตาม serving_model_path()
+    def __init__(self, model_path=None, check_interval=2.0):
+        self.model_path = model_path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self.version = None
+        self.model = None
+        self.refresh()
+
+    def _current_version(self):
+        path = self.model_path or serving_model_path()
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def needs_check(self):
+        # ถึงเวลาตรวจไฟล์แล้วหรือยัง (ถ้ายัง ใช้ self.model ได้เลยโดยไม่ต้องเรียก refresh)
+        return time.monotonic() >= self._next_check
+
+    def refresh(self):
+        # ตรวจไฟล์และโหลดใหม่ถ้าถูกแทนที่ คืนค่าโมเดลปัจจุบัน
+        # (api_server เรียกผ่าน thread แยก เพื่อไม่ให้ os.stat / joblib.load ทำให้ event loop ค้าง)
+        now = time.monotonic()
+        if now < self._next_check:
+            return self.model
+        with self._lock:
+            if now < self._next_check:
+                return self.model
+            self._next_check = now + self.check_interval
+            try:
+                version = self._current_version()
+            except OSError:  # ไฟล์กำลังถูกแทนที่ ใช้โมเดลเดิมไปก่อน
+                if self.model is None:
+                    raise
+                return self.model
+            if version != self.version:
+                # โหลดโมเดลใหม่ให้เสร็จก่อน แล้วจึงสลับ (คำขอที่กำลังทำงานยังใช้โมเดลเดิมได้จนจบ)
+                model = load_model(version[0])
+                if self.model is not None:
+                    self.reloads += 1
+                self.model, self.version = model, version
+            return self.model
+
+    def predict(self, features):
+        return self.refresh().predict(features)
+
+def decode_image(image_bytes):
+    # แปลง bytes ของไฟล์ภาพ (jpg/png) ให้เป็น numpy array แบบ RGB
+    # ใช้ convert("RGB") เพื่อรองรับ PNG ที่มีช่อง Alpha หรือภาพขาวดำ ซึ่ง cv2.cvtColor(RGB2BGR) รับไม่ได้
+    from PIL import Image
+    t = clock()
+    image_pil = Image.open(io.BytesIO(image_bytes))
+    if image_pil.mode != "RGB": # ภาพ RGB อยู่แล้วไม่ต้อง convert (ประหยัดการคัดลอกภาพทั้งภาพหนึ่งครั้ง)
+        image_pil = image_pil.convert("RGB")
+    image_np = np.array(image_pil)
+    lap('decode', t)
+    return image_np
+
+def load_image(path):
+    with open(path, 'rb') as f:
+        return decode_image(f.read())
+
+# --- ฟังก์ชันทำนาย Brix จากค่าสีเฉลี่ย ---
+def predict_brix(model, rgb_rows):
+    # rgb_rows: ลำดับของ (R, G, B) หลายแถว -> เรียก model.predict เพียงครั้งเดียวกับเมทริกซ์ที่ซ้อนกัน
+    features = np.asarray(rgb_rows, dtype=np.float64).reshape(-1, 3)
+    if len(features) == 0:
+        return np.empty(0, dtype=np.float64)
+    t = clock()
+    # ***สำคัญ: ป้องกันค่า Brix ไม่ให้ติดลบ***
+    brix_values = np.maximum(0.0, model.predict(features))
+    lap('predict', t)
+    return brix_values
+
+def score_rgb(model, r_avg, g_avg, b_avg):
+    # ทำนาย Brix ของกล้วย 1 ลูก แล้วแปลงเป็นระดับความสุก
+    predicted_brix = float(predict_brix(model, [(r_avg, g_avg, b_avg)])[0])
+    ripeness_level_num, ripeness_status, advice, percentage_ripeness = predict_ripeness(predicted_brix)
+    return predicted_brix, ripeness_level_num, ripeness_status, advice, percentage_ripeness
+
+def score_bananas(model, bananas):
+    # เพิ่มค่า Brix, ระดับความสุก และร้อยละความสุก ให้กับผลจาก detect_bananas
+    # โดยเรียก model.predict เพียงครั้งเดียวสำหรับกล้วยทุกลูก
+    brix_values = predict_brix(model, [(b['R'], b['G'], b['B']) for b in bananas])
+    levels, percentages = ripeness_levels(brix_values)
+    for banana, predicted_brix, level, percentage in zip(bananas, brix_values, levels, percentages):
+        banana.update(brix=float(predicted_brix), ripeness_level=int(level), percentage=float(percentage))
+    return bananas
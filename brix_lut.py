@@ -0,0 +1,103 @@
+# --- brix_lut: คอมไพล์โมเดล RGB -> Brix ให้เป็นตาราง lookup (3 มิติ) ---
+# โมเดลใช้ข้อมูลเพียง 3 ค่า (ค่าเฉลี่ย R, G, B) จึงคำนวณค่า Brix ล่วงหน้าบนจุดตาราง grid^3 ได้
+# แล้วตอนใช้งานจริงประมาณค่าระหว่างจุดด้วย trilinear interpolation (ใช้แค่ numpy ไม่ต้อง import scikit-learn)
+# ตาราง float32 ขนาด 32^3 ใช้พื้นที่ 128 KB บันทึกเป็น .npy ที่เปิดแบบ memory-map ได้
+#
+# ตัวอย่างการใช้งาน:
+#   python brix_lut.py                          # คอมไพล์ banana_brix_model.pkl -> banana_brix_lut.npy และรายงานความแม่นยำ
+#   python brix_lut.py --grid 64 -o lut64.npy
+#   python batch_score.py ภาพ/ --model banana_brix_lut.npy
+import argparse
+
+import numpy as np
+
+from brix_engine import DEFAULT_LUT_PATH, DEFAULT_MODEL_PATH, load_model, predict_brix, ripeness_levels
+
+
+class BrixLUT:
+    # ใช้แทนโมเดล scikit-learn ได้โดยตรง (มีเมธอด predict(X) แบบเดียวกัน)
+    def __init__(self, table):
+        if table.ndim != 3 or len(set(table.shape)) != 1 or table.shape[0] < 2:
+            raise ValueError(f"ตาราง lookup ต้องเป็น array 3 มิติขนาด grid^3 (ได้ {table.shape})")
+        self.table = table
+        self.grid_size = table.shape[0]
+        self._scale = (self.grid_size - 1) / 255.0
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        return cls(np.load(path, mmap_mode='r' if mmap else None))
+
+    def save(self, path):
+        np.save(path, np.ascontiguousarray(self.table, dtype=np.float32))
+
+    def predict(self, features):
+        # features: array (N, 3) ของค่า R, G, B (0-255) -> ค่า Brix (N,)
+        coords = np.clip(np.asarray(features, dtype=np.float64).reshape(-1, 3), 0.0, 255.0) * self._scale
+        base = np.minimum(coords.astype(np.intp), self.grid_size - 2)
+        frac = coords - base
+        r0, g0, b0 = base[:, 0], base[:, 1], base[:, 2]
+        fr, fg, fb = frac[:, 0], frac[:, 1], frac[:, 2]
+        t = self.table
+
+        # ประมาณค่าตามแกน B, G แล้ว R ตามลำดับ จากจุดมุมทั้ง 8 ของลูกบาศก์ที่ล้อมรอบ
+        c00 = t[r0, g0, b0] * (1 - fb) + t[r0, g0, b0 + 1] * fb
+        c01 = t[r0, g0 + 1, b0] * (1 - fb) + t[r0, g0 + 1, b0 + 1] * fb
+        c10 = t[r0 + 1, g0, b0] * (1 - fb) + t[r0 + 1, g0, b0 + 1] * fb
+        c11 = t[r0 + 1, g0 + 1, b0] * (1 - fb) + t[r0 + 1, g0 + 1, b0 + 1] * fb
+        c0 = c00 * (1 - fg) + c01 * fg
+        c1 = c10 * (1 - fg) + c11 * fg
+        return c0 * (1 - fr) + c1 * fr
+
+
+def compile_lut(model, grid_size=32):
+    # คำนวณค่า Brix ของทุกจุดตาราง (R, G, B) ระหว่าง 0-255 ด้วย model.predict ครั้งเดียว
+    axis = np.linspace(0.0, 255.0, grid_size)
+    r, g, b = np.meshgrid(axis, axis, axis, indexing='ij')
+    grid_points = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+    # เก็บค่าก่อนตัดค่าติดลบ แล้วให้ predict_brix ตัดหลังประมาณค่า
+    # (ถ้าตัดก่อน บริเวณที่ Brix ใกล้ 0 จะประมาณค่าผิดเพราะรอยหักของกราฟ)
+    table = np.asarray(model.predict(grid_points)).reshape(grid_size, grid_size, grid_size)
+    return BrixLUT(table.astype(np.float32))
+
+
+def accuracy_report(model, lut, samples=200000, seed=0):
+    # เปรียบเทียบตาราง lookup กับโมเดลเดิมบนค่าสีสุ่มทั่วทั้งช่วง 0-255
+    rng = np.random.default_rng(seed)
+    features = rng.uniform(0.0, 255.0, size=(samples, 3))
+    expected = predict_brix(model, features)
+    actual = predict_brix(lut, features)
+    error = np.abs(actual - expected)
+    expected_levels, _ = ripeness_levels(expected)
+    actual_levels, _ = ripeness_levels(actual)
+    return {
+        'grid_size': lut.grid_size,
+        'table_bytes': int(lut.table.nbytes),
+        'samples': samples,
+        'max_abs_error_brix': float(error.max()),
+        'mean_abs_error_brix': float(error.mean()),
+        'p99_abs_error_brix': float(np.percentile(error, 99)),
+        'ripeness_level_agreement': float(np.mean(expected_levels == actual_levels)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="คอมไพล์โมเดล RGB -> Brix เป็นตาราง lookup (.npy) และรายงานความแม่นยำ")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help="พาธไฟล์โมเดล (.pkl)")
+    parser.add_argument('--grid', type=int, default=32, help="จำนวนจุดตารางต่อช่องสี (เช่น 32 หรือ 64)")
+    parser.add_argument('--output', '-o', default=DEFAULT_LUT_PATH, help="ไฟล์ตาราง lookup ที่จะบันทึก")
+    parser.add_argument('--samples', type=int, default=200000, help="จำนวนค่าสีสุ่มที่ใช้วัดความแม่นยำ")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model)
+    lut = compile_lut(model, args.grid)
+    lut.save(args.output)
+    report = accuracy_report(model, BrixLUT.load(args.output), samples=args.samples)
+    print(f"บันทึกตาราง lookup {args.grid}^3 ที่ {args.output} ({report['table_bytes'] / 1024:.0f} KB)")
+    print(f"ความคลาดเคลื่อนเทียบกับโมเดลเดิม ({report['samples']} ตัวอย่าง): "
+          f"สูงสุด {report['max_abs_error_brix']:.4f} °Bx, เฉลี่ย {report['mean_abs_error_brix']:.6f} °Bx, "
+          f"p99 {report['p99_abs_error_brix']:.4f} °Bx")
+    print(f"ระดับความสุกตรงกัน {report['ripeness_level_agreement'] * 100:.3f}%")
+
+
+if __name__ == '__main__':
+    main()
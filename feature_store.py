@@ -0,0 +1,114 @@
+# --- feature_store: เก็บคุณลักษณะของภาพกล้วยที่สกัดแล้ว และค่า Brix จากเครื่องวัด (refractometer) ---
+# ทั้งสองตารางเป็นไฟล์ binary แบบเขียนต่อท้ายอย่างเดียว (append-only) ของ numpy structured array
+# อ่านด้วย np.memmap โดยไม่ต้องโหลดทั้งไฟล์เข้าหน่วยความจำ และเข้าถึงทีละคอลัมน์ได้ (เช่น table['R'])
+# ภาพแต่ละภาพอ้างอิงด้วย SHA-256 ของเนื้อไฟล์ จึงไม่สกัดภาพเดิมซ้ำแม้ย้ายหรือเปลี่ยนชื่อไฟล์
+#
+# โครงสร้างโฟลเดอร์:
+#   banana_features/features.v1.bin   หนึ่งแถวต่อภาพ (ภาพที่ไม่พบกล้วยก็เก็บ found=False เพื่อไม่ต้องสกัดซ้ำ)
+#   banana_features/labels.v1.bin     หนึ่งแถวต่อค่าที่วัดได้ (ภาพเดียวกันวัดซ้ำได้ ทุกค่าใช้เป็นตัวอย่างฝึก)
+import hashlib
+import os
+
+import numpy as np
+
+from brix_engine import BANANA_FEATURE_COLUMNS
+
+DEFAULT_STORE_DIR = 'banana_features'
+
+# digest เก็บเป็นเลขฐานสิบหก (ASCII) เพราะ dtype 'S' ของ numpy ตัด byte 0 ที่ท้ายค่าทิ้ง
+FEATURE_DTYPE = np.dtype([('digest', 'S64'), ('found', '?'), ('extracted_at', '<f8')]
+                         + [(column, '<f4') for column in BANANA_FEATURE_COLUMNS])
+LABEL_DTYPE = np.dtype([('digest', 'S64'), ('brix', '<f4'), ('recorded_at', '<f8')])
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest().encode('ascii')
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return content_digest(f.read())
+
+
+class AppendOnlyTable:
+    def __init__(self, path, dtype):
+        self.path = path
+        self.dtype = dtype
+
+    def __len__(self):
+        # นับเฉพาะแถวที่เขียนครบ (ถ้าโปรแกรมหยุดกลางการเขียน แถวสุดท้ายที่ไม่ครบจะถูกข้ามไป)
+        try:
+            return os.path.getsize(self.path) // self.dtype.itemsize
+        except OSError:
+            return 0
+
+    def read(self, start=0):
+        # คืนค่า memmap แบบอ่านอย่างเดียวของแถว start เป็นต้นไป
+        rows = len(self)
+        if rows <= start:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode='r', offset=start * self.dtype.itemsize,
+                         shape=(rows - start,))
+
+    def append(self, records):
+        records = np.asarray(records, dtype=self.dtype)
+        if len(records) == 0:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        rows = len(self)
+        with open(self.path, 'ab') as f:
+            # ตัดแถวที่เขียนไม่ครบจากครั้งก่อนออก ให้แถวใหม่เริ่มตรงขอบของแถวเสมอ
+            if f.tell() != rows * self.dtype.itemsize:
+                f.truncate(rows * self.dtype.itemsize)
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class FeatureStore:
+    def __init__(self, directory=DEFAULT_STORE_DIR):
+        self.directory = directory
+        self.features = AppendOnlyTable(os.path.join(directory, 'features.v1.bin'), FEATURE_DTYPE)
+        self.labels = AppendOnlyTable(os.path.join(directory, 'labels.v1.bin'), LABEL_DTYPE)
+
+    def known_digests(self):
+        return set(self.features.read()['digest'].tolist())
+
+    def add_features(self, rows, timestamp):
+        # rows: รายการ (digest, dict จาก extract_banana_features หรือ None ถ้าไม่พบกล้วย)
+        records = np.zeros(len(rows), dtype=FEATURE_DTYPE)
+        for record, (digest, features) in zip(records, rows):
+            record['digest'] = digest
+            record['extracted_at'] = timestamp
+            record['found'] = features is not None
+            for column in BANANA_FEATURE_COLUMNS:
+                record[column] = np.nan if features is None else features[column]
+        self.features.append(records)
+
+    def add_labels(self, rows, timestamp):
+        # rows: รายการ (digest, ค่า Brix ที่วัดได้)
+        records = np.zeros(len(rows), dtype=LABEL_DTYPE)
+        for record, (digest, brix) in zip(records, rows):
+            record['digest'] = digest
+            record['brix'] = brix
+            record['recorded_at'] = timestamp
+        self.labels.append(records)
+
+    def training_rows(self, columns, start_label=0):
+        # จับคู่ค่า Brix ตั้งแต่แถวที่ start_label กับคุณลักษณะของภาพเดียวกัน (ผ่าน digest)
+        # คืนค่า (X, y, จำนวนค่า Brix ที่ยังไม่มีคุณลักษณะหรือไม่พบกล้วยในภาพ)
+        features = self.features.read()
+        index = {}
+        for row, (digest, found) in enumerate(zip(features['digest'], features['found'])):
+            if found:
+                index.setdefault(digest, row)
+        labels = self.labels.read(start_label)
+        rows = [index.get(digest) for digest in labels['digest']]
+        matched = np.array([row is not None for row in rows], dtype=bool)
+        selected = np.array([row for row in rows if row is not None], dtype=np.intp)
+        missing = int((~matched).sum())
+        if len(selected) == 0:
+            return np.empty((0, len(columns))), np.empty(0), missing
+        X = np.stack([np.asarray(features[column], dtype=np.float64)[selected] for column in columns], axis=1)
+        y = np.asarray(labels['brix'], dtype=np.float64)[matched]
+        return X, y, missing
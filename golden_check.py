@@ -0,0 +1,207 @@
+# --- golden_check: ตรวจว่าผลการประเมิน (ค่าสีเฉลี่ย RGB, Brix, ระดับความสุก) ไม่เปลี่ยนไปจากชุดอ้างอิง ---
+# ภาพในชุดอ้างอิงสร้างจาก make_synthetic_scene ด้วย seed คงที่ (ไม่ต้องเก็บไฟล์ภาพไว้ใน repo)
+# ค่าที่คาดหวังเก็บไว้ใน golden_set.json; ระดับความสุกและจำนวนกล้วยต้องตรงกันทุกค่า
+# ส่วนค่าสีเฉลี่ยและ Brix ยอมให้คลาดเคลื่อนได้ตาม tolerance ในไฟล์ (ต่าง OpenCV/แพลตฟอร์มอาจปัดเศษต่างกันเล็กน้อย)
+# ตัวอย่างการใช้งาน:
+#   python golden_check.py            # ตรวจ (exit code 1 ถ้าไม่ผ่าน) ใช้ก่อน merge งานปรับประสิทธิภาพ
+#   python golden_check.py --update   # สร้าง golden_set.json ใหม่ เมื่อตั้งใจเปลี่ยนผลลัพธ์ (เช่น ปรับช่วงสีหรือโมเดล)
+# ค่าเริ่มต้นใช้โมเดลตั้งต้นของ repo (ไม่ใช่โมเดลที่ฝึกต่อด้วย retrain.py) ผลจึงไม่เปลี่ยนหลัง python retrain.py fit
+import argparse
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from benchmark_segmentation import make_synthetic_scene
+from brix_engine import (DEFAULT_LUT_PATH, DEFAULT_MAX_WORKING_SIDE, DEFAULT_MODEL_PATH, ONLINE_LUT_PATH,
+                         SEGMENTATION_BACKENDS, base_model_path, decode_image, detect_bananas, get_avg_color_rgb,
+                         load_model, predict_ripeness, ripeness_levels, score_bananas, score_rgb)
+from retrain import DEFAULT_STATE_PATH
+
+DEFAULT_GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_set.json')
+
+# ภาพในชุดอ้างอิง: (ชื่อ, กว้าง, สูง, จำนวนกล้วย, seed)
+GOLDEN_SCENES = (
+    ('vga_empty', 640, 480, 0, 1),
+    ('vga_single', 640, 480, 1, 2),
+    ('vga_six', 640, 480, 6, 3),
+    ('fhd_single', 1920, 1080, 1, 4),
+    ('fhd_four', 1920, 1080, 4, 5),
+    ('12mp_single', 4000, 3000, 1, 6),
+    ('12mp_four', 4000, 3000, 4, 7),
+)
+
+# ค่า Brix ที่ตรวจระดับความสุกโดยตรง (รวมค่าที่ขอบของแต่ละระดับ)
+GOLDEN_BRIX_VALUES = (0.0, 4.99, 5.0, 5.01, 8.0, 8.01, 12.0, 12.01, 18.0, 18.01, 22.0, 22.01, 25.0, 25.01, 30.0, 45.0)
+
+DEFAULT_TOLERANCE = {
+    'rgb': 0.5,             # ค่าสีเฉลี่ยต่างจากชุดอ้างอิงได้ไม่เกิน (ระดับสี 0-255)
+    'brix': 0.1,            # ค่า Brix ต่างจากชุดอ้างอิงได้ไม่เกิน
+    'downscale_brix': 0.3,  # ค่า Brix เมื่อย่อภาพ (max_working_side) ต่างจากความละเอียดเต็มได้ไม่เกิน
+    'downscale_rgb': 3.5,   # ค่าสีเฉลี่ยของภาพ 12MP เมื่อย่อภาพ ต่างจากความละเอียดเต็มได้ไม่เกิน (ทุกช่องสี)
+    'lut_brix': 0.01,       # ค่า Brix จากตาราง LUT ต่างจากโมเดล .pkl ได้ไม่เกิน
+}
+
+
+def _round(values, digits=4):
+    return None if values[0] is None else [round(float(v), digits) for v in values]
+
+
+def evaluate(model):
+    # คำนวณผลทั้งหมดของชุดอ้างอิงด้วยโค้ดปัจจุบัน (รูปแบบเดียวกับ golden_set.json)
+    scenes = {}
+    for name, width, height, count, seed in GOLDEN_SCENES:
+        image = make_synthetic_scene(width, height, count, seed=seed)
+        # ผ่าน PNG (ไม่สูญเสียข้อมูล) เพื่อให้ decode_image อยู่ในเส้นทางที่ตรวจด้วย
+        image = decode_image(cv2.imencode('.png', cv2.cvtColor(image, cv2.COLOR_RGB2BGR))[1].tobytes())
+        scene = {'size': [width, height], 'count': count, 'single': {}}
+        for backend in SEGMENTATION_BACKENDS:
+            for max_side in (None, DEFAULT_MAX_WORKING_SIDE):
+                rgb = get_avg_color_rgb(image, max_working_side=max_side, backend=backend)
+                entry = {'rgb': _round(rgb)}
+                if rgb[0] is not None:
+                    brix, level, _, _, percentage = score_rgb(model, *rgb)
+                    entry.update(brix=round(brix, 4), level=level, percentage=round(percentage, 4))
+                scene['single'][f"{backend}@{max_side or 'full'}"] = entry
+        bananas = score_bananas(model, detect_bananas(image))
+        scene['multi'] = [{'bbox': list(b['bbox']), 'rgb': _round((b['R'], b['G'], b['B'])),
+                           'brix': round(b['brix'], 4), 'level': b['ripeness_level']} for b in bananas]
+        scenes[name] = scene
+
+    ripeness = {}
+    levels, percentages = ripeness_levels(GOLDEN_BRIX_VALUES)
+    for brix, level, percentage in zip(GOLDEN_BRIX_VALUES, levels, percentages):
+        level_num, _, _, percentage_ripeness = predict_ripeness(brix)
+        ripeness[str(brix)] = {'level': level_num, 'percentage': round(percentage_ripeness, 4),
+                               'vectorised_level': int(level), 'vectorised_percentage': round(float(percentage), 4)}
+    return {'scenes': scenes, 'ripeness': ripeness}
+
+
+def _close(a, b, tolerance):
+    if a is None or b is None:
+        return a is None and b is None
+    return len(a) == len(b) and all(abs(x - y) <= tolerance for x, y in zip(a, b))
+
+
+def compare(current, golden, tolerance):
+    # คืนค่ารายการข้อความของทุกจุดที่ไม่ตรงกับชุดอ้างอิง (รายการว่าง = ผ่าน)
+    failures = []
+    for name, expected in golden['scenes'].items():
+        actual = current['scenes'].get(name)
+        if actual is None:
+            failures.append(f"{name}: ไม่มีภาพนี้ใน GOLDEN_SCENES")
+            continue
+        for key, want in expected['single'].items():
+            got = actual['single'].get(key, {})
+            if not _close(got.get('rgb'), want['rgb'], tolerance['rgb']):
+                failures.append(f"{name} [{key}] RGB {got.get('rgb')} != {want['rgb']}")
+            if want['rgb'] is None:
+                continue
+            if not abs(got.get('brix', float('nan')) - want['brix']) <= tolerance['brix']:
+                failures.append(f"{name} [{key}] Brix {got.get('brix')} != {want['brix']}")
+            if got.get('level') != want['level']:
+                failures.append(f"{name} [{key}] ระดับความสุก {got.get('level')} != {want['level']}")
+        if len(actual['multi']) != len(expected['multi']):
+            failures.append(f"{name} [multi] พบกล้วย {len(actual['multi'])} ลูก != {len(expected['multi'])}")
+            continue
+        for index, (got, want) in enumerate(zip(actual['multi'], expected['multi'])):
+            if not _close(got['rgb'], want['rgb'], tolerance['rgb']):
+                failures.append(f"{name} [multi #{index}] RGB {got['rgb']} != {want['rgb']}")
+            if abs(got['brix'] - want['brix']) > tolerance['brix'] or got['level'] != want['level']:
+                failures.append(f"{name} [multi #{index}] Brix/ระดับ {got['brix']}/{got['level']} "
+                                f"!= {want['brix']}/{want['level']}")
+            if not _close(got['bbox'], want['bbox'], 2):
+                failures.append(f"{name} [multi #{index}] bbox {got['bbox']} != {want['bbox']}")
+
+    for brix, want in golden['ripeness'].items():
+        got = current['ripeness'].get(brix)
+        if got != want:
+            failures.append(f"Brix {brix}: ระดับความสุก {got} != {want}")
+    return failures
+
+
+def check_consistency(current, tolerance):
+    # ตรวจความสอดคล้องภายในที่ไม่ขึ้นกับชุดอ้างอิง:
+    # backend ทุกแบบให้ผลเท่ากัน, การย่อภาพคลาดเคลื่อนไม่เกินที่กำหนด (Brix ทุกภาพ และค่าสี RGB ของภาพ 12MP),
+    # predict_ripeness ตรงกับ ripeness_levels
+    failures = []
+    for name, scene in current['scenes'].items():
+        for max_side in ('full', DEFAULT_MAX_WORKING_SIDE):
+            results = [scene['single'][f"{backend}@{max_side}"]['rgb'] for backend in SEGMENTATION_BACKENDS]
+            if not all(_close(rgb, results[0], 1e-3) for rgb in results[1:]):
+                failures.append(f"{name} @{max_side}: backend ให้ค่าสีต่างกัน {results}")
+        for backend in SEGMENTATION_BACKENDS:
+            full = scene['single'][f"{backend}@full"]
+            scaled = scene['single'][f"{backend}@{DEFAULT_MAX_WORKING_SIDE}"]
+            if full['rgb'] is None or scaled['rgb'] is None:
+                if full['rgb'] != scaled['rgb']:
+                    failures.append(f"{name} [{backend}] ย่อภาพแล้วผลการพบกล้วยเปลี่ยนไป")
+            elif abs(scaled['brix'] - full['brix']) > tolerance['downscale_brix']:
+                failures.append(f"{name} [{backend}] ย่อภาพแล้วค่า Brix เปลี่ยนมากเกินไป "
+                                f"{scaled['brix']} vs {full['brix']}")
+            # ภาพ 12MP ถูกย่อลง 4 เท่าต่อด้าน (กรณีที่ใช้จริงกับภาพจากกล้องมือถือ) จึงตรวจค่าสีทุกช่องด้วย
+            # (กล้วยหลายลูกในภาพเดียวมีขนาดเล็กกว่า สัดส่วนขอบที่ถูก blur จึงมากกว่า ค่าสีคลาดเคลื่อนมากกว่า)
+            if max(scene['size']) >= 4000 and full['rgb'] is not None and scaled['rgb'] is not None \
+                    and not _close(scaled['rgb'], full['rgb'], tolerance['downscale_rgb']):
+                failures.append(f"{name} [{backend}] ย่อภาพแล้วค่าสีเปลี่ยนมากเกินไป {scaled['rgb']} vs {full['rgb']}")
+    for brix, entry in current['ripeness'].items():
+        if (entry['level'], entry['percentage']) != (entry['vectorised_level'], entry['vectorised_percentage']):
+            failures.append(f"Brix {brix}: predict_ripeness {entry['level']} != ripeness_levels "
+                            f"{entry['vectorised_level']}")
+
+    # ตาราง LUT ต้องให้ค่าเท่ากับโมเดลที่ใช้คอมไพล์ บนค่าสีของชุดอ้างอิง:
+    # ตารางของ repo เทียบกับโมเดลตั้งต้น .pkl และตารางของโมเดลที่ฝึกต่อ (ถ้ามี) เทียบกับไฟล์สถานะของ retrain.py
+    rgb_rows = [entry['rgb'] for scene in current['scenes'].values()
+                for entry in scene['single'].values() if entry['rgb'] is not None]
+    rgb_rows = np.asarray(rgb_rows, dtype=np.float64)
+    lut_sources = (
+        (DEFAULT_LUT_PATH, DEFAULT_MODEL_PATH, "python brix_lut.py"),
+        (ONLINE_LUT_PATH, DEFAULT_STATE_PATH, f"python brix_lut.py --model {DEFAULT_STATE_PATH} -o {ONLINE_LUT_PATH}"),
+    )
+    for lut_path, source_path, rebuild in lut_sources:
+        if not (os.path.exists(lut_path) and os.path.exists(source_path)):
+            continue
+        lut, model = load_model(lut_path), load_model(source_path)
+        difference = np.abs(np.maximum(0.0, lut.predict(rgb_rows)) - np.maximum(0.0, model.predict(rgb_rows)))
+        if difference.max() > tolerance['lut_brix']:
+            failures.append(f"{lut_path}: ต่างจาก {source_path} สูงสุด {difference.max():.4f} Brix "
+                            f"(สร้าง LUT ใหม่ด้วย {rebuild})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ตรวจผลการประเมินกล้วยเทียบกับชุดอ้างอิง (golden set)")
+    parser.add_argument('--golden', default=DEFAULT_GOLDEN_PATH, help="ไฟล์ชุดอ้างอิง")
+    parser.add_argument('--model', help="โมเดลที่ใช้ทำนาย (.pkl หรือ LUT .npy) ค่าเริ่มต้น = โมเดลตั้งต้นของ repo")
+    parser.add_argument('--update', action='store_true', help="บันทึกผลปัจจุบันเป็นชุดอ้างอิงใหม่")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model or base_model_path())
+    current = evaluate(model)
+    failures = check_consistency(current, DEFAULT_TOLERANCE)
+
+    if args.update:
+        if failures:
+            print("\n".join(failures))
+            print("ไม่บันทึกชุดอ้างอิง เพราะผลไม่สอดคล้องกันภายใน")
+            sys.exit(1)
+        golden = {'tolerance': DEFAULT_TOLERANCE, **current}
+        with open(args.golden, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, indent=1, ensure_ascii=False)
+        print(f"บันทึก {args.golden} แล้ว ({len(current['scenes'])} ภาพ, {len(current['ripeness'])} ค่า Brix)")
+        return
+
+    with open(args.golden, encoding='utf-8') as f:
+        golden = json.load(f)
+    failures += compare(current, golden, {**DEFAULT_TOLERANCE, **golden.get('tolerance', {})})
+    if failures:
+        print("\n".join(failures))
+        print(f"ไม่ผ่าน: {len(failures)} รายการ")
+        sys.exit(1)
+    print(f"ผ่าน: {len(golden['scenes'])} ภาพ และ {len(golden['ripeness'])} ค่า Brix ตรงกับชุดอ้างอิง")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# --- loadtest_api: ทดสอบโหลดของ api_server ในเครื่อง รายงาน throughput และ latency (p50/p99) ---
+# ตัวอย่างการใช้งาน (เปิด python api_server.py ไว้ก่อน):
+#   python loadtest_api.py --requests 500 --concurrency 32
+#   python loadtest_api.py --image กล้วย.jpg --batch 4       # ส่ง 4 ภาพต่อคำขอแบบ multipart
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+
+def make_synthetic_jpeg(width=1280, height=960):
+    # ภาพกล้วยสังเคราะห์ (วงรีสีเหลืองบนพื้นหลังสีเทาเข้ม) สำหรับใช้เมื่อไม่ได้ระบุ --image
+    image = np.full((height, width, 3), 30, np.uint8)
+    cv2.ellipse(image, (width // 2, height // 2), (width // 4, height // 8), 20, 0, 360, (40, 200, 230), -1)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def build_request(url, image_bytes, batch):
+    # สร้าง HTTP/1.1 request แบบ keep-alive: 1 ภาพส่งเป็น body ตรงๆ, หลายภาพส่งแบบ multipart/form-data
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    if batch <= 1:
+        content_type, body = 'image/jpeg', image_bytes
+    else:
+        boundary = uuid.uuid4().hex
+        chunks = []
+        for index in range(batch):
+            chunks.append(f'--{boundary}\r\nContent-Disposition: form-data; name="image"; '
+                          f'filename="{index}.jpg"\r\nContent-Type: image/jpeg\r\n\r\n'.encode())
+            chunks.append(image_bytes + b'\r\n')
+        chunks.append(f'--{boundary}--\r\n'.encode())
+        content_type, body = f'multipart/form-data; boundary={boundary}', b''.join(chunks)
+    head = (f'POST {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n')
+    return parts.hostname, parts.port or 80, head.encode() + body
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("เซิร์ฟเวอร์ปิดการเชื่อมต่อ")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, payload, counter, latencies, statuses):
+    # แต่ละ client ใช้การเชื่อมต่อเดียวส่งคำขอต่อเนื่อง จนกว่าจะครบจำนวนคำขอทั้งหมด
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            start = time.perf_counter()
+            writer.write(payload)
+            await writer.drain()
+            status = await read_response(reader)
+            latencies.append((status, (time.perf_counter() - start) * 1000))
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(url, image_bytes, requests, concurrency, batch):
+    host, port, payload = build_request(url, image_bytes, batch)
+    counter, latencies, statuses = [requests], [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, payload, counter, latencies, statuses) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    # percentile คำนวณจากคำขอที่สำเร็จ (200) เท่านั้น คำขอที่ถูกปฏิเสธทันที (429) ตอบเร็วมาก
+    # ถ้านำมารวมจะทำให้ latency ดูต่ำกว่าเวลาประเมินภาพจริง จึงรายงานจำนวนที่ถูกปฏิเสธแยกไว้
+    ordered = sorted(latency for status, latency in latencies if status == 200)
+    ok = len(ordered)
+    rejected = statuses.get(429, 0)
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'images_per_request': batch,
+        'elapsed_s': elapsed,
+        'requests_per_s': len(latencies) / elapsed,
+        'images_per_s': ok * batch / elapsed,
+        'ok': ok,
+        'rejected': rejected,
+        'rejected_rate': rejected / len(latencies) if latencies else 0.0,
+        'p50_ms': statistics.median(ordered) if ordered else None,
+        'p99_ms': ordered[min(ok - 1, int(ok * 0.99))] if ordered else None,
+        'max_ms': ordered[-1] if ordered else None,
+        'status_counts': statuses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ทดสอบโหลดของ api_server")
+    parser.add_argument('--url', default='http://127.0.0.1:8000/score')
+    parser.add_argument('--image', help="ไฟล์ภาพที่ใช้ทดสอบ (ค่าเริ่มต้น = ภาพกล้วยสังเคราะห์ 1280x960)")
+    parser.add_argument('--requests', type=int, default=200, help="จำนวนคำขอทั้งหมด")
+    parser.add_argument('--concurrency', type=int, default=16, help="จำนวนการเชื่อมต่อพร้อมกัน")
+    parser.add_argument('--batch', type=int, default=1, help="จำนวนภาพต่อคำขอ (>1 = multipart)")
+    parser.add_argument('--json', action='store_true', help="แสดงผลเป็น JSON")
+    args = parser.parse_args(argv)
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = make_synthetic_jpeg()
+    report = asyncio.run(run(args.url, image_bytes, args.requests, args.concurrency, args.batch))
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"{report['requests']} คำขอ ใน {report['elapsed_s']:.2f} s (concurrency {report['concurrency']}, "
+          f"{report['images_per_request']} ภาพ/คำขอ)")
+    print(f"throughput: {report['requests_per_s']:.1f} คำขอ/s, {report['images_per_s']:.1f} ภาพ/s (เฉพาะที่สำเร็จ)")
+    if report['ok']:
+        print(f"latency (เฉพาะที่สำเร็จ {report['ok']} คำขอ): p50 {report['p50_ms']:.1f} ms, "
+              f"p99 {report['p99_ms']:.1f} ms, max {report['max_ms']:.1f} ms")
+    else:
+        print("latency: ไม่มีคำขอที่สำเร็จ")
+    print(f"ถูกปฏิเสธ (429): {report['rejected']} คำขอ ({report['rejected_rate'] * 100:.1f}%)")
+    print(f"status: {report['status_counts']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+# --- pipeline_metrics: จับเวลาแต่ละขั้นตอนของการประมวลผลภาพ และนับสถิติ (ปิดไว้เป็นค่าเริ่มต้น) ---
+# เปิดใช้งานด้วยตัวแปรแวดล้อม BRIX_METRICS=1 หรือเรียก enable()
+# เมื่อปิดอยู่ clock() คืนค่า None และ lap()/incr()/observe_resolution() จะ return ทันที จึงแทบไม่มีค่าใช้จ่าย
+#
+# รูปแบบที่ใช้ในโค้ด:
+#   t = clock()
+#   blurred = cv2.GaussianBlur(...)
+#   t = lap('blur', t)        # บันทึกเวลาของขั้นตอน 'blur' แล้วเริ่มจับเวลาขั้นถัดไป
+#
+# ตัวอย่างการใช้งานจากบรรทัดคำสั่ง (profile ภาพเดียวด้วย cProfile):
+#   python pipeline_metrics.py กล้วย.jpg
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+# ขอบบนของช่วงเวลา (วินาที) สำหรับ histogram ของแต่ละขั้นตอน
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# ขอบบนของขนาดภาพ (ล้าน pixel) สำหรับ histogram ความละเอียดของภาพที่รับเข้ามา
+RESOLUTION_BUCKETS_MP = (0.3, 1.0, 2.0, 5.0, 8.0, 12.0, 16.0, 24.0)
+
+
+class PipelineMetrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # stage -> [count, sum_seconds, bucket_counts...]
+            self.stages = {}
+            self.counters = {}
+            self.resolution = [0] * (len(RESOLUTION_BUCKETS_MP) + 1)
+
+    def record(self, stage, seconds):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = [0, 0.0] + [0] * (len(LATENCY_BUCKETS) + 1)
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2 + index] += 1
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_resolution(self, height, width):
+        megapixels = height * width / 1e6
+        index = next((i for i, bound in enumerate(RESOLUTION_BUCKETS_MP) if megapixels <= bound),
+                     len(RESOLUTION_BUCKETS_MP))
+        with self._lock:
+            self.resolution[index] += 1
+
+    # --- ส่งต่อสถิติระหว่าง process (เช่น จาก worker ใน process pool กลับมาที่ process หลัก) ---
+    def collect(self):
+        # คืนค่าสถิติดิบทั้งหมดของ process นี้ แล้วล้างค่า (ใช้ใน worker process)
+        with self._lock:
+            data = {'stages': self.stages, 'counters': self.counters, 'resolution': self.resolution}
+            self.stages, self.counters = {}, {}
+            self.resolution = [0] * (len(RESOLUTION_BUCKETS_MP) + 1)
+        return data
+
+    def merge(self, data):
+        with self._lock:
+            for stage, values in data['stages'].items():
+                entry = self.stages.setdefault(stage, [0] * len(values))
+                for i, value in enumerate(values):
+                    entry[i] += value
+            for name, value in data['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for i, value in enumerate(data['resolution']):
+                self.resolution[i] += value
+
+    # --- การแสดงผล ---
+    def to_json(self):
+        with self._lock:
+            stages = {stage: {'count': entry[0], 'total_ms': entry[1] * 1000,
+                              'avg_ms': entry[1] / entry[0] * 1000 if entry[0] else 0.0}
+                      for stage, entry in self.stages.items()}
+            counters = dict(self.counters)
+            resolution = list(self.resolution)
+        images = counters.get('images_processed', 0)
+        labels = [f"<={bound}MP" for bound in RESOLUTION_BUCKETS_MP] + [f">{RESOLUTION_BUCKETS_MP[-1]}MP"]
+        return {
+            'enabled': self.enabled,
+            'stages': stages,
+            'counters': counters,
+            'no_banana_rate': counters.get('no_banana', 0) / images if images else 0.0,
+            'input_resolution': dict(zip(labels, resolution)),
+        }
+
+    def render_prometheus(self):
+        # รูปแบบข้อความของ Prometheus (text exposition format)
+        with self._lock:
+            stages = {stage: list(entry) for stage, entry in self.stages.items()}
+            counters = dict(self.counters)
+            resolution = list(self.resolution)
+        lines = ['# HELP brix_stage_seconds Time spent in each image pipeline stage.',
+                 '# TYPE brix_stage_seconds histogram']
+        for stage, entry in sorted(stages.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), entry[2:]):
+                cumulative += count
+                lines.append(f'brix_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'brix_stage_seconds_sum{{stage="{stage}"}} {entry[1]:.9f}')
+            lines.append(f'brix_stage_seconds_count{{stage="{stage}"}} {entry[0]}')
+        for name, value in sorted(counters.items()):
+            lines.append(f'# TYPE brix_{name}_total counter')
+            lines.append(f'brix_{name}_total {value}')
+        lines.append('# HELP brix_input_megapixels Resolution of images entering the pipeline.')
+        lines.append('# TYPE brix_input_megapixels histogram')
+        cumulative = 0
+        for bound, count in zip(RESOLUTION_BUCKETS_MP + ('+Inf',), resolution):
+            cumulative += count
+            lines.append(f'brix_input_megapixels_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'brix_input_megapixels_count {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = PipelineMetrics(enabled=os.environ.get('BRIX_METRICS', '') in ('1', 'true', 'yes'))
+
+
+def enable(enabled=True):
+    METRICS.enabled = enabled
+
+
+def clock():
+    # เริ่มจับเวลา คืนค่า None เมื่อปิดการเก็บสถิติ
+    return time.perf_counter() if METRICS.enabled else None
+
+
+def lap(stage, started):
+    # บันทึกเวลาตั้งแต่ started จนถึงตอนนี้ให้กับขั้นตอน stage แล้วคืนเวลาปัจจุบันสำหรับขั้นตอนถัดไป
+    if started is None:
+        return None
+    now = time.perf_counter()
+    METRICS.record(stage, now - started)
+    return now
+
+
+def incr(name, amount=1):
+    if METRICS.enabled:
+        METRICS.add(name, amount)
+
+
+def observe_resolution(image_array):
+    if METRICS.enabled:
+        METRICS.add_resolution(image_array.shape[0], image_array.shape[1])
+
+
+def profile_call(func, *args, limit=25, **kwargs):
+    # รัน func ภายใต้ cProfile (ใช้กับคำขอเดียวเมื่อต้องการหาจุดที่ช้า) คืนค่า (ผลลัพธ์, ข้อความสรุป pstats)
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+    return result, stream.getvalue()
+
+
+def main(argv=None):
+    import argparse
+
+    # ใช้ตัวแปรจากโมดูล pipeline_metrics (ไม่ใช่ __main__) ให้เป็นตัวเดียวกับที่ brix_engine บันทึกสถิติ
+    import pipeline_metrics
+    from brix_engine import DEFAULT_MAX_WORKING_SIDE, get_avg_color_rgb, load_image, load_serving_model, score_rgb
+
+    parser = argparse.ArgumentParser(description="profile การประเมินภาพกล้วยหนึ่งภาพ (cProfile + เวลาแต่ละขั้นตอน)")
+    parser.add_argument('image', help="ไฟล์ภาพ")
+    parser.add_argument('--backend', default='fused', help="วิธีหาตำแหน่งกล้วย")
+    parser.add_argument('--max-side', type=int, default=DEFAULT_MAX_WORKING_SIDE, help="0 = ความละเอียดเต็ม")
+    parser.add_argument('--limit', type=int, default=25, help="จำนวนฟังก์ชันที่แสดงในผล cProfile")
+    parser.add_argument('--prometheus', action='store_true', help="แสดงสถิติในรูปแบบ Prometheus แทน JSON")
+    args = parser.parse_args(argv)
+
+    pipeline_metrics.enable()
+    metrics = pipeline_metrics.METRICS
+    model = load_serving_model()
+
+    def analyse():
+        rgb = get_avg_color_rgb(load_image(args.image), max_working_side=args.max_side, backend=args.backend)
+        return None if rgb[0] is None else score_rgb(model, *rgb)
+
+    result, report = pipeline_metrics.profile_call(analyse, limit=args.limit)
+    print(report)
+    print(metrics.render_prometheus() if args.prometheus else json.dumps(metrics.to_json(), indent=2))
+    if result is None:
+        print("ไม่พบกล้วยในภาพ")
+    else:
+        print(f"Brix = {result[0]:.2f}, ระดับความสุก {result[1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+# --- retrain: ฝึกโมเดล RGB -> Brix ต่อจากค่าที่วัดด้วยเครื่องวัดความหวาน (refractometer) ทีละรอบ ---
+# ไม่ต้องประมวลผลภาพเก่าซ้ำ: คุณลักษณะของภาพถูกเก็บไว้ใน feature store (ดู feature_store.py)
+# และการฝึกแต่ละรอบใช้เฉพาะค่าที่วัดเพิ่มหลังรอบก่อน (SGDRegressor.partial_fit)
+#
+# ขั้นตอน:
+#   featurize  สกัดคุณลักษณะของภาพแบบขนานใน process pool (ข้ามภาพที่ SHA-256 มีอยู่ใน store แล้ว)
+#   label      บันทึกค่า Brix ที่วัดได้จากไฟล์ CSV (คอลัมน์ image, brix) และสกัดคุณลักษณะของภาพที่ยังไม่มี
+#   fit        ฝึกโมเดลต่อด้วยค่าที่วัดใหม่ แล้วคอมไพล์เป็นตาราง lookup banana_brix_lut.online.npy แบบ atomic
+#              app.py และ api_server.py ใช้ ReloadingModel จึงเปลี่ยนไปใช้โมเดลใหม่เองโดยไม่ต้อง restart
+#   status     แสดงจำนวนภาพ/ค่าที่วัด และสถานะของโมเดล
+#
+# ตัวอย่างการใช้งาน:
+#   python retrain.py featurize ภาพ/ --workers 8
+#   python retrain.py label วัดค่า_2026-10-18.csv
+#   python retrain.py fit --dry-run      # ดูความคลาดเคลื่อนก่อน/หลังฝึก โดยยังไม่เปลี่ยนโมเดลที่ใช้งาน
+#   python retrain.py fit
+# ทั้งสองไฟล์ของโมเดลที่ฝึกต่อไม่อยู่ใน git (banana_brix_lut.npy ของ repo ไม่ถูกแก้ไข)
+# ย้อนกลับไปใช้โมเดลเดิม: ลบ banana_brix_online.pkl และ banana_brix_lut.online.npy
+import argparse
+import copy
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from batch_score import init_worker, iter_image_paths
+from brix_engine import (DEFAULT_MAX_WORKING_SIDE, DEFAULT_MODEL_PATH, ONLINE_LUT_PATH, decode_image,
+                         extract_banana_features, load_model, predict_brix)
+from feature_store import DEFAULT_STORE_DIR, FeatureStore, content_digest, file_digest
+
+# สถานะของโมเดลที่ฝึกต่อ (ค่าสัมประสิทธิ์ และจำนวนค่าที่วัดที่ใช้ฝึกไปแล้ว)
+DEFAULT_STATE_PATH = 'banana_brix_online.pkl'
+# โมเดลที่ใช้งานรับ input เป็นค่าสีเฉลี่ย R, G, B เท่านั้น (ตาราง lookup, app.py, api_server.py)
+# คุณลักษณะอื่นใน store (H, S, V, brown_fraction, area) เก็บไว้สำหรับโมเดลรุ่นถัดไป
+TRAINING_COLUMNS = ('R', 'G', 'B')
+# หารค่าสีด้วย 255 ให้ input อยู่ในช่วง 0-1 เสมอ (ช่วงคงที่ ไม่ต้องใช้ scaler ที่เปลี่ยนไปตามข้อมูลแต่ละรอบ)
+FEATURE_SCALE = 255.0
+
+
+class OnlineBrixModel:
+    # ใช้แทนโมเดลเดิมได้โดยตรง (predict รับค่า R, G, B 0-255) และฝึกต่อได้ทีละกลุ่มด้วย partial_fit
+    def __init__(self, regressor):
+        self.regressor = regressor
+        self.labels_seen = 0
+        self.history = []
+
+    @classmethod
+    def from_linear_model(cls, base_model, eta0=0.01, alpha=1e-6):
+        # เริ่มจากค่าสัมประสิทธิ์ของโมเดลเดิม (LinearRegression) แทนการเริ่มจากศูนย์
+        from sklearn.linear_model import SGDRegressor
+
+        # สลับลำดับข้อมูลเองใน partial_fit (ผลการฝึกจึงทำซ้ำได้)
+        regressor = SGDRegressor(learning_rate='constant', eta0=eta0, alpha=alpha, shuffle=False, random_state=0)
+        regressor.coef_ = np.asarray(base_model.coef_, dtype=np.float64).ravel() * FEATURE_SCALE
+        regressor.intercept_ = np.atleast_1d(np.asarray(base_model.intercept_, dtype=np.float64))
+        return cls(regressor)
+
+    def predict(self, features):
+        features = np.asarray(features, dtype=np.float64).reshape(-1, len(TRAINING_COLUMNS))
+        return self.regressor.predict(features / FEATURE_SCALE)
+
+    def partial_fit(self, features, targets, epochs=5, seed=0):
+        rng = np.random.default_rng(seed + self.labels_seen)
+        scaled = np.asarray(features, dtype=np.float64) / FEATURE_SCALE
+        for _ in range(epochs):
+            order = rng.permutation(len(targets))
+            self.regressor.partial_fit(scaled[order], targets[order])
+
+
+def featurize_file(path, digest=None, max_working_side=DEFAULT_MAX_WORKING_SIDE):
+    # ทำงานใน worker process: คืนค่า (path, digest, คุณลักษณะหรือ None, ข้อความ error หรือ None)
+    # digest: SHA-256 ที่คำนวณไว้แล้ว (featurize hash ไฟล์ก่อนเพื่อข้ามภาพเดิม จึงไม่ต้อง hash ซ้ำ)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if digest is None:
+            digest = content_digest(data)
+        return path, digest, extract_banana_features(decode_image(data), max_working_side=max_working_side), None
+    except Exception as e:  # ไฟล์เสีย / ไม่ใช่ภาพ
+        return path, None, None, str(e)
+
+
+def _digest_or_none(path):
+    try:
+        return file_digest(path)
+    except OSError:
+        return None
+
+
+def featurize(store, paths, workers=None, max_working_side=DEFAULT_MAX_WORKING_SIDE, batch_size=256, digests=None):
+    # สกัดคุณลักษณะของภาพที่ยังไม่มีใน store; บันทึกทุก batch_size ภาพ (หยุดกลางทางแล้วรันต่อได้)
+    # digests: SHA-256 ของแต่ละไฟล์ใน paths ถ้าคำนวณไว้แล้ว (None = hash ใน process pool)
+    # คืนค่า (จำนวนภาพที่สกัดใหม่, จำนวนภาพที่ข้ามเพราะมีอยู่แล้ว, จำนวนภาพที่ผิดพลาด)
+    known = store.known_digests()
+    added = skipped = failed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        # hash ไฟล์แบบขนานก่อน แล้วส่งเฉพาะภาพที่ยังไม่เคยเห็นไปสกัดคุณลักษณะ พร้อม digest ที่ได้
+        if digests is None:
+            digests = pool.map(_digest_or_none, paths, chunksize=16)
+        pending, pending_digests = [], []
+        for path, digest in zip(paths, digests):
+            if digest is None:
+                print(f"อ่านไฟล์ไม่ได้: {path}", file=sys.stderr)
+                failed += 1
+            elif digest in known:
+                skipped += 1
+            else:
+                known.add(digest)
+                pending.append(path)
+                pending_digests.append(digest)
+
+        rows = []
+        work = partial(featurize_file, max_working_side=max_working_side)
+        for path, digest, features, error in pool.map(work, pending, pending_digests, chunksize=4):
+            if error is not None:
+                print(f"ประมวลผลไม่ได้: {path}: {error}", file=sys.stderr)
+                failed += 1
+                continue
+            rows.append((digest, features))
+            if len(rows) >= batch_size:
+                store.add_features(rows, time.time())
+                added += len(rows)
+                rows = []
+        store.add_features(rows, time.time())
+        added += len(rows)
+    return added, skipped, failed
+
+
+def read_readings(csv_path):
+    # อ่านไฟล์ CSV ที่มีคอลัมน์ image (พาธภาพ เทียบกับโฟลเดอร์ของไฟล์ CSV) และ brix (ค่าที่วัดได้)
+    base_dir = os.path.dirname(os.path.abspath(csv_path))
+    readings = []
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                brix = float(row['brix'])
+                image = row['image'].strip()
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"{csv_path} บรรทัด {line_number}: ต้องมีคอลัมน์ image และ brix (ตัวเลข)")
+            readings.append((os.path.join(base_dir, image), brix))
+    return readings
+
+
+def add_readings(store, readings, workers=None):
+    # บันทึกค่าที่วัดได้ โดยอ้างอิงภาพด้วย digest และสกัดคุณลักษณะของภาพที่ยังไม่มีใน store
+    labels, paths, digests = [], [], []
+    for path, brix in readings:
+        digest = _digest_or_none(path)
+        if digest is None:
+            print(f"ไม่พบไฟล์ภาพ: {path}", file=sys.stderr)
+            continue
+        labels.append((digest, brix))
+        paths.append(path)
+        digests.append(digest)
+    featurize(store, paths, workers=workers, digests=digests)
+    store.add_labels(labels, time.time())
+    return len(labels)
+
+
+def load_state(state_path, base_model_path):
+    import joblib
+
+    if os.path.exists(state_path):
+        return joblib.load(state_path)
+    return OnlineBrixModel.from_linear_model(load_model(base_model_path))
+
+
+def _replace_atomically(path, write):
+    # เขียนลงไฟล์ชั่วคราวในโฟลเดอร์เดียวกัน แล้วแทนที่ด้วย os.replace
+    # ผู้ที่เปิดไฟล์เดิมอยู่ (เช่น ตาราง lookup แบบ memory-map) ยังอ่านไฟล์เดิมได้จนกว่าจะโหลดใหม่
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+def fit(store, model, epochs=5, grid_size=32, state_path=DEFAULT_STATE_PATH, lut_path=ONLINE_LUT_PATH,
+        dry_run=False):
+    # ฝึกด้วยค่าที่วัดหลังรอบก่อน (model.labels_seen) คืนค่า dict สรุปผล หรือ None ถ้าไม่มีค่าใหม่
+    import joblib
+
+    from brix_lut import accuracy_report, compile_lut
+
+    total_labels = len(store.labels)
+    if total_labels < model.labels_seen:
+        raise ValueError(f"store มีค่าที่วัด {total_labels} ค่า น้อยกว่าที่โมเดลใช้ฝึกไปแล้ว ({model.labels_seen} ค่า) "
+                         f"ตรวจสอบ --store และ --state ว่าเป็นชุดเดียวกัน")
+    if total_labels == model.labels_seen:
+        return None
+    X, y, missing = store.training_rows(TRAINING_COLUMNS, start_label=model.labels_seen)
+    # ค่าที่วัดซึ่งภาพไม่พบกล้วย (missing) ใช้ฝึกไม่ได้ จึงนับว่าใช้ไปแล้วเช่นกัน
+    summary = {'new_labels': total_labels - model.labels_seen, 'trained': len(y), 'unusable': missing}
+    previous = copy.deepcopy(model)
+    if len(y):
+        # ความคลาดเคลื่อนบนค่าใหม่ ก่อนฝึก (= ประเมินแบบ test-then-train) และหลังฝึก
+        summary['mae_before'] = float(np.mean(np.abs(predict_brix(model, X) - y)))
+        model.partial_fit(X, y, epochs=epochs)
+        summary['mae_after'] = float(np.mean(np.abs(predict_brix(model, X) - y)))
+    model.labels_seen = total_labels
+    model.history.append({'time': time.time(), **summary})
+    if dry_run:
+        return summary
+
+    if len(y):
+        lut = compile_lut(model, grid_size)
+        summary['lut'] = accuracy_report(model, lut, samples=20000)
+        summary['change_vs_previous'] = accuracy_report(previous, lut, samples=20000)
+        _replace_atomically(lut_path, lambda f: np.save(f, np.ascontiguousarray(lut.table, dtype=np.float32)))
+    _replace_atomically(state_path, lambda f: joblib.dump(model, f))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ฝึกโมเดลประเมิน Brix ต่อจากค่าที่วัดด้วยเครื่องวัดความหวาน")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help="โฟลเดอร์ของ feature store")
+    commands = parser.add_subparsers(dest='command', required=True)
+    # --workers ระบุหลังชื่อคำสั่ง (python retrain.py featurize ภาพ/ --workers 8)
+    workers_option = argparse.ArgumentParser(add_help=False)
+    workers_option.add_argument('--workers', type=int, default=None, help="จำนวน process (ค่าเริ่มต้น = จำนวน CPU)")
+
+    featurize_parser = commands.add_parser('featurize', parents=[workers_option],
+                                           help="สกัดคุณลักษณะของภาพใหม่เก็บใน store")
+    featurize_parser.add_argument('inputs', nargs='+', help="ไฟล์ภาพหรือโฟลเดอร์")
+    featurize_parser.add_argument('--no-recursive', action='store_true', help="ไม่ค้นหาในโฟลเดอร์ย่อย")
+
+    label_parser = commands.add_parser('label', parents=[workers_option],
+                                       help="บันทึกค่า Brix ที่วัดได้จากไฟล์ CSV (image, brix)")
+    label_parser.add_argument('csv', nargs='+')
+
+    fit_parser = commands.add_parser('fit', help="ฝึกโมเดลต่อด้วยค่าที่วัดใหม่ แล้วแทนที่ตาราง lookup")
+    fit_parser.add_argument('--state', default=DEFAULT_STATE_PATH, help="ไฟล์สถานะของโมเดลที่ฝึกต่อ")
+    fit_parser.add_argument('--base-model', default=DEFAULT_MODEL_PATH, help="โมเดลตั้งต้น (ใช้เมื่อยังไม่มีไฟล์สถานะ)")
+    fit_parser.add_argument('--output', '-o', default=ONLINE_LUT_PATH,
+                            help="ตาราง lookup ที่แอปใช้งานแทนตารางของ repo")
+    fit_parser.add_argument('--epochs', type=int, default=5, help="จำนวนรอบที่วนฝึกบนค่าที่วัดใหม่")
+    fit_parser.add_argument('--grid', type=int, default=32, help="ขนาดตาราง lookup ต่อช่องสี")
+    fit_parser.add_argument('--dry-run', action='store_true', help="แสดงผลโดยไม่บันทึกโมเดล")
+
+    status_parser = commands.add_parser('status', help="แสดงสถานะของ store และโมเดล")
+    status_parser.add_argument('--state', default=DEFAULT_STATE_PATH, help="ไฟล์สถานะของโมเดลที่ฝึกต่อ")
+    args = parser.parse_args(argv)
+
+    store = FeatureStore(args.store)
+    if args.command == 'featurize':
+        paths = list(iter_image_paths(args.inputs, recursive=not args.no_recursive))
+        added, skipped, failed = featurize(store, paths, workers=args.workers)
+        print(f"สกัดใหม่ {added} ภาพ, ข้าม {skipped} ภาพที่มีอยู่แล้ว, ผิดพลาด {failed} ภาพ "
+              f"(ใน store ทั้งหมด {len(store.features)} ภาพ)")
+    elif args.command == 'label':
+        try:
+            readings = [reading for csv_path in args.csv for reading in read_readings(csv_path)]
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"บันทึกค่าที่วัดได้ {add_readings(store, readings, workers=args.workers)} ค่า "
+              f"(ทั้งหมด {len(store.labels)} ค่า)")
+    elif args.command == 'fit':
+        model = load_state(args.state, args.base_model)
+        try:
+            summary = fit(store, model, epochs=args.epochs, grid_size=args.grid, state_path=args.state,
+                          lut_path=args.output, dry_run=args.dry_run)
+        except ValueError as e:
+            sys.exit(str(e))
+        if summary is None:
+            print("ไม่มีค่าที่วัดใหม่ตั้งแต่การฝึกครั้งก่อน")
+            return
+        print(f"ค่าที่วัดใหม่ {summary['new_labels']} ค่า ใช้ฝึก {summary['trained']} ค่า "
+              f"(ภาพไม่พบกล้วย {summary['unusable']} ค่า)")
+        if summary['trained']:
+            print(f"ความคลาดเคลื่อนเฉลี่ยบนค่าใหม่: ก่อนฝึก {summary['mae_before']:.3f} °Bx, "
+                  f"หลังฝึก {summary['mae_after']:.3f} °Bx")
+        if 'lut' in summary:
+            change = summary['change_vs_previous']
+            print(f"บันทึก {args.output} แล้ว (ต่างจากโมเดลก่อนหน้าเฉลี่ย {change['mean_abs_error_brix']:.3f} °Bx, "
+                  f"ระดับความสุกเปลี่ยน {(1 - change['ripeness_level_agreement']) * 100:.2f}% ของช่วงสี)")
+        elif args.dry_run:
+            print("--dry-run: ไม่ได้บันทึกโมเดล")
+    else:
+        features = store.features.read()
+        print(f"store: {args.store}")
+        print(f"  ภาพ {len(features)} ภาพ (พบกล้วย {int(np.count_nonzero(features['found']))} ภาพ)")
+        print(f"  ค่าที่วัดได้ {len(store.labels)} ค่า")
+        if os.path.exists(args.state):
+            model = load_state(args.state, DEFAULT_MODEL_PATH)
+            coef = model.regressor.coef_ / FEATURE_SCALE
+            print(f"โมเดลที่ฝึกต่อ: ใช้ค่าที่วัดไปแล้ว {model.labels_seen} ค่า, ฝึก {len(model.history)} รอบ, "
+                  f"Brix = {coef[0]:.4f}R {coef[1]:+.4f}G {coef[2]:+.4f}B {model.regressor.intercept_[0]:+.3f}")
+        else:
+            print("ยังไม่เคยฝึกต่อ (ใช้โมเดลเดิม)")
+
+
+if __name__ == '__main__':
+    # เรียกผ่านโมดูล retrain (ไม่ใช่ __main__) ให้ pickle ของ OnlineBrixModel อ้างอิงชื่อโมดูลที่ import ได้จากที่อื่น
+    import retrain
+    retrain.main()
@@ -0,0 +1,263 @@
+# --- stream_monitor: ติดตามความสุกของกล้วยแบบต่อเนื่องจากวิดีโอหรือกล้อง (webcam / V4L2) ---
+# ตัวอย่างการใช้งาน:
+#   python stream_monitor.py 0                      # กล้องตัวแรกของเครื่อง
+#   python stream_monitor.py /dev/video2 --fps 5
+#   python stream_monitor.py สายพาน.mp4 --no-pace  # ทดสอบกับไฟล์วิดีโอ โดยอ่านเร็วที่สุดเท่าที่ทำได้
+#
+# thread หลักอ่านภาพจากกล้อง ส่วนการหาตำแหน่งกล้วยและทำนาย Brix ทำใน worker thread
+# คิวระหว่างสองส่วนมีขนาดจำกัด ถ้า worker ทำไม่ทัน ภาพเก่าที่ค้างอยู่จะถูกทิ้ง (ประมวลผลภาพล่าสุดเสมอ)
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+from brix_engine import ReloadingModel, detect_bananas, predict_brix, predict_ripeness
+
+
+class StageTimers:
+    # ตัวนับเวลาแยกตามขั้นตอน (ms) และตัวนับเหตุการณ์ ใช้ร่วมกันระหว่าง thread
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.counters = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            count, total, _ = self.latency.get(stage, (0, 0.0, 0.0))
+            self.latency[stage] = (count + 1, total + seconds, seconds)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            latency = {stage: {'count': count, 'avg_ms': total / count * 1000, 'last_ms': last * 1000}
+                       for stage, (count, total, last) in self.latency.items()}
+            return {'latency': latency, 'counters': dict(self.counters)}
+
+
+# ขนาดของ ROI ปัดขึ้นเป็นทวีคูณของค่านี้ (pixel) เพื่อให้ขนาดภาพที่ส่งให้ detect_bananas คงที่ข้ามเฟรม
+# buffer ของ backend 'fused' จองใหม่ทุกครั้งที่ขนาดภาพเปลี่ยน ถ้าไม่ปัด ROI จะมีขนาดต่างกันเกือบทุกเฟรม
+ROI_QUANTUM = 32
+
+
+def _roi_span(start, end, limit, min_length):
+    # ช่วง [start, end) ที่ตัดให้อยู่ในภาพแล้ว -> (จุดเริ่ม, ความยาว) ที่ปัดความยาวขึ้นเป็นทวีคูณของ ROI_QUANTUM
+    # (ไม่น้อยกว่า min_length) ขยายออกเท่าๆ กันทั้งสองด้าน และเลื่อนให้อยู่ในภาพโดยคงความยาวไว้
+    length = max(-(-(end - start) // ROI_QUANTUM) * ROI_QUANTUM, min_length)
+    if length >= limit:
+        return 0, limit
+    start -= (length - (end - start)) // 2
+    return min(max(0, start), limit - length), length
+
+
+def expand_bbox(bbox, frame_shape, margin, min_size=(0, 0)):
+    # ขยายกรอบ (x, y, w, h) ออกไปด้านละ margin เท่าของขนาดกรอบ แล้วปัดขนาดขึ้น (ดู ROI_QUANTUM) ให้อยู่ในภาพ
+    # min_size: (w, h) ขนาดขั้นต่ำของ ROI (ใช้ขนาด ROI ของเฟรมก่อนหน้า เพื่อไม่ให้ขนาดสลับไปมาเมื่อกรอบขยับเล็กน้อย)
+    x, y, w, h = bbox
+    pad_x, pad_y = int(w * margin), int(h * margin)
+    x0, width = _roi_span(max(0, x - pad_x), min(frame_shape[1], x + w + pad_x), frame_shape[1], min_size[0])
+    y0, height = _roi_span(max(0, y - pad_y), min(frame_shape[0], y + h + pad_y), frame_shape[0], min_size[1])
+    return x0, y0, width, height
+
+
+class RipenessMonitor:
+    # รับภาพทีละเฟรมผ่าน submit() แล้วเรียก on_result(dict) จาก worker thread เมื่อประมวลผลเสร็จ
+    # smoothing: ค่าน้ำหนักของ exponential moving average ของ Brix (1.0 = ไม่ทำให้เรียบ)
+    # roi_margin: ขยายกรอบกล้วยของเฟรมก่อนหน้าเพื่อใช้เป็นบริเวณที่ประมวลผลในเฟรมถัดไป (None = ใช้ทั้งภาพเสมอ)
+    def __init__(self, model, on_result, smoothing=0.3, roi_margin=0.25, max_working_side=640,
+                 min_banana_pixel_area=3000, queue_size=1):
+        self.model = model
+        self.on_result = on_result
+        self.smoothing = smoothing
+        self.roi_margin = roi_margin
+        self.max_working_side = max_working_side
+        self.min_banana_pixel_area = min_banana_pixel_area
+        self.timers = StageTimers()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name='ripeness-monitor', daemon=True)
+        self._stopped = threading.Event()
+        self._last_bbox = None
+        self._roi_size = (0, 0)
+        self._smoothed_brix = None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, drain=True):
+        # drain=True: รอให้ภาพที่ค้างอยู่ในคิวถูกประมวลผลก่อนหยุด
+        if drain:
+            self._queue.join()
+        self._stopped.set()
+        self._thread.join()
+
+    def submit(self, frame_bgr, frame_index, timestamp):
+        # timestamp: เวลาที่ได้ภาพมา (time.perf_counter) ใช้คำนวณ latency ตั้งแต่อ่านภาพจนได้ผล
+        # ไม่บล็อก thread ที่อ่านกล้อง: ถ้าคิวเต็ม ทิ้งภาพเก่าที่ยังไม่ได้ประมวลผลแล้วใส่ภาพใหม่แทน
+        item = (frame_bgr, frame_index, timestamp)
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                self.timers.incr('frames_submitted')
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                    self.timers.incr('frames_dropped')
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                frame_bgr, frame_index, timestamp = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.on_result(self.process(frame_bgr, frame_index, timestamp))
+            except Exception as e:  # ไม่ให้ worker หยุดทำงานเพราะภาพเสียเพียงภาพเดียว
+                self.timers.incr('errors')
+                print(f"ประมวลผลเฟรม {frame_index} ไม่สำเร็จ: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def _segment(self, frame_bgr):
+        # คืนค่า (กล้วยลูกที่ใหญ่ที่สุด หรือ None, ใช้ ROI หรือไม่)
+        if self._last_bbox is not None and self.roi_margin is not None:
+            x, y, w, h = expand_bbox(self._last_bbox, frame_bgr.shape, self.roi_margin, self._roi_size)
+            self._roi_size = (w, h)
+            crop = cv2.cvtColor(frame_bgr[y:y + h, x:x + w], cv2.COLOR_BGR2RGB)
+            bananas = detect_bananas(crop, max_working_side=self.max_working_side,
+                                     min_banana_pixel_area=self.min_banana_pixel_area)
+            if bananas:
+                banana = bananas[0]
+                bx, by, bw, bh = banana['bbox']
+                banana['bbox'] = (bx + x, by + y, bw, bh)
+                return banana, True
+            self.timers.incr('roi_misses')
+        # เฟรมแรก หรือกล้วยออกนอกกรอบเดิม: ประมวลผลทั้งภาพ และเริ่มขนาด ROI ใหม่จากกรอบที่พบ
+        self._roi_size = (0, 0)
+        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        bananas = detect_bananas(frame_rgb, max_working_side=self.max_working_side,
+                                 min_banana_pixel_area=self.min_banana_pixel_area)
+        return (bananas[0] if bananas else None), False
+
+    def process(self, frame_bgr, frame_index, timestamp):
+        start = time.perf_counter()
+        banana, used_roi = self._segment(frame_bgr)
+        segmented = time.perf_counter()
+        self.timers.record('segment', segmented - start)
+        self.timers.incr('frames_processed')
+
+        result = {'frame': frame_index, 'roi': used_roi, 'found': banana is not None}
+        if banana is None:
+            # ไม่พบกล้วย: ล้างกรอบเดิม แต่คงค่า Brix ที่ทำให้เรียบไว้ เพื่อไม่ให้ผลกระโดด
+            self._last_bbox = None
+            self.timers.incr('no_banana')
+        else:
+            self._last_bbox = banana['bbox']
+            brix = float(predict_brix(self.model, [(banana['R'], banana['G'], banana['B'])])[0])
+            if self._smoothed_brix is None:
+                self._smoothed_brix = brix
+            else:
+                self._smoothed_brix += self.smoothing * (brix - self._smoothed_brix)
+            self.timers.record('predict', time.perf_counter() - segmented)
+            result.update(bbox=banana['bbox'], R=banana['R'], G=banana['G'], B=banana['B'], brix=brix)
+
+        if self._smoothed_brix is not None:
+            ripeness_level_num, _, _, percentage_ripeness = predict_ripeness(self._smoothed_brix)
+            result.update(smoothed_brix=self._smoothed_brix, ripeness_level=ripeness_level_num,
+                          percentage=percentage_ripeness)
+        self.timers.record('total', time.perf_counter() - start)
+        result['latency_ms'] = (time.perf_counter() - timestamp) * 1000
+        return result
+
+
+def open_source(source):
+    # ตัวเลข = หมายเลขกล้อง (0, 1, ...), นอกนั้นเป็นพาธไฟล์วิดีโอหรืออุปกรณ์ เช่น /dev/video0
+    if source.isdigit():
+        return cv2.VideoCapture(int(source)), True
+    return cv2.VideoCapture(source), source.startswith('/dev/')
+
+
+def run(source, model, target_fps=10.0, pace=True, on_result=None, stats_every=0, **monitor_kwargs):
+    # อ่านภาพจาก source แล้วส่งเข้า RipenessMonitor ด้วยอัตราไม่เกิน target_fps
+    # pace=True: ไฟล์วิดีโอจะถูกอ่านตามความเร็วจริงของวิดีโอ (จำลองการทำงานของกล้อง)
+    capture, is_live = open_source(source)
+    if not capture.isOpened():
+        raise RuntimeError(f"ไม่สามารถเปิดแหล่งภาพ '{source}'")
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_interval = 1.0 / source_fps
+    submit_interval = 1.0 / target_fps if target_fps else 0.0
+
+    monitor = RipenessMonitor(model, on_result or (lambda result: None), **monitor_kwargs).start()
+    timers = monitor.timers
+    frame_index = 0
+    next_submit = time.perf_counter()
+    started = next_submit
+    try:
+        while True:
+            read_start = time.perf_counter()
+            ok, frame = capture.read()
+            if not ok:
+                break
+            now = time.perf_counter()
+            timers.record('read', now - read_start)
+            timers.incr('frames_read')
+
+            # ข้ามเฟรมที่มาถี่เกินกว่า target_fps (เวลาของไฟล์วิดีโอคิดจากลำดับเฟรม)
+            frame_time = now if is_live or pace else started + frame_index * frame_interval
+            if frame_time >= next_submit:
+                monitor.submit(frame, frame_index, now)
+                next_submit += submit_interval
+                if next_submit <= frame_time:  # ตามไม่ทัน: เริ่มนับช่วงเวลาใหม่ ไม่ส่งเฟรมรัวๆ เพื่อชดเชย
+                    next_submit = frame_time + submit_interval
+            else:
+                timers.incr('frames_skipped')
+
+            frame_index += 1
+            if stats_every and frame_index % stats_every == 0:
+                print(json.dumps(timers.snapshot()), file=sys.stderr)
+            if pace and not is_live:
+                delay = started + frame_index * frame_interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        capture.release()
+        monitor.stop()
+    return timers.snapshot()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ติดตามค่า Brix และระดับความสุกของกล้วยจากวิดีโอหรือกล้องแบบต่อเนื่อง")
+    parser.add_argument('source', help="หมายเลขกล้อง (เช่น 0), อุปกรณ์ V4L2 (เช่น /dev/video0) หรือไฟล์วิดีโอ")
+    parser.add_argument('--model', default=None,
+                        help="พาธไฟล์โมเดล (.pkl หรือ .npy) ค่าเริ่มต้น = โมเดลเดียวกับที่แอปและ API ใช้")
+    parser.add_argument('--fps', type=float, default=10.0, help="จำนวนเฟรมต่อวินาทีสูงสุดที่ส่งไปประมวลผล")
+    parser.add_argument('--smoothing', type=float, default=0.3, help="ค่าน้ำหนัก EMA ของ Brix (1.0 = ไม่ทำให้เรียบ)")
+    parser.add_argument('--roi-margin', type=float, default=0.25, help="ขยายกรอบกล้วยของเฟรมก่อนหน้า (สัดส่วน)")
+    parser.add_argument('--no-roi', action='store_true', help="ประมวลผลทั้งภาพทุกเฟรม")
+    parser.add_argument('--max-side', type=int, default=640, help="ย่อภาพให้ด้านที่ยาวที่สุดไม่เกินค่านี้ (0 = ความละเอียดเต็ม)")
+    parser.add_argument('--no-pace', action='store_true', help="อ่านไฟล์วิดีโอให้เร็วที่สุด แทนการอ่านตามความเร็วจริง")
+    parser.add_argument('--stats-every', type=int, default=0, help="พิมพ์สถิติเวลาทุกๆ N เฟรมไปที่ stderr (0 = ปิด)")
+    args = parser.parse_args(argv)
+
+    def print_result(result):
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    # ทำงานต่อเนื่องนาน จึงโหลดโมเดลใหม่เองเมื่อไฟล์ถูกแทนที่ (หลัง python retrain.py fit) เหมือน app.py / api_server.py
+    stats = run(args.source, ReloadingModel(args.model), target_fps=args.fps, pace=not args.no_pace,
+                on_result=print_result, stats_every=args.stats_every, smoothing=args.smoothing,
+                roi_margin=None if args.no_roi else args.roi_margin, max_working_side=args.max_side)
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()